@@ -0,0 +1,199 @@
+"""Refresh benchmark of the coordinator against the fake ubus server.
+
+Runs the real OpenwrtDataUpdateCoordinator for 1 to 100 simulated routers and
+reports refresh latency percentiles, requests per refresh and CPU time per
+refresh. The fake server runs in its own process so the CPU time only covers
+the integration. Needs Home Assistant and pytest-homeassistant-custom-component:
+
+    python benchmarks/bench_refresh.py --routers 1 10 100 --clients 200 --latency 5
+
+With --transport local the routers run fake_ubus_cli.py against the unix socket
+of the fake server instead of posting JSON-RPC requests to it.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from homeassistant import config_entries  # noqa: E402
+from homeassistant.const import (  # noqa: E402
+    CONF_HOST,
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_SCAN_INTERVAL,
+    CONF_SENSORS,
+    CONF_SSL,
+    CONF_USERNAME,
+    CONF_VERIFY_SSL,
+)
+from homeassistant.core import HomeAssistant  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry  # noqa: E402
+
+from custom_components.ha_openwrt.const import (  # noqa: E402
+    CONF_BANDWIDTH_DEVICES,
+    CONF_BUTTONS,
+    CONF_SENSOR_BANDWIDTH,
+    CONF_SENSOR_DEVICES_COUNT,
+    CONF_TRANSPORT,
+    CONF_UBUS_SOCKET,
+    DOMAIN,
+    TRANSPORT_HTTP,
+    TRANSPORT_LOCAL,
+)
+from custom_components.ha_openwrt.coordinator import OpenwrtDataUpdateCoordinator  # noqa: E402
+from fake_ubus import add_arguments, arguments_from_options, options_from_args  # noqa: E402
+
+SERVER_START_TIMEOUT = 10
+UBUS_CLI = (sys.executable, str(ROOT / "benchmarks" / "fake_ubus_cli.py"))
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+def create_hass(config_dir: str) -> HomeAssistant:
+    try:
+        return HomeAssistant(config_dir)
+    except TypeError:
+        # Home Assistant before 2024.2 takes no arguments
+        hass = HomeAssistant()
+        hass.config.config_dir = config_dir
+        return hass
+
+
+def create_coordinator(hass: HomeAssistant, index: int, host: str, args) -> OpenwrtDataUpdateCoordinator:
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title=f"router{index}",
+        data={
+            CONF_NAME: f"router{index}",
+            CONF_HOST: host,
+            CONF_USERNAME: "root",
+            CONF_PASSWORD: args.password,
+            CONF_SSL: False,
+            CONF_VERIFY_SSL: False,
+            CONF_SCAN_INTERVAL: 5,
+            CONF_SENSORS: [CONF_SENSOR_DEVICES_COUNT, CONF_SENSOR_BANDWIDTH],
+            CONF_BANDWIDTH_DEVICES: "wan,br-lan",
+            CONF_BUTTONS: [],
+            CONF_TRANSPORT: args.transport,
+            CONF_UBUS_SOCKET: args.socket,
+        },
+    )
+    config_entries.current_entry.set(entry)
+    coordinator = OpenwrtDataUpdateCoordinator(hass, config=entry.data)
+    if args.transport == TRANSPORT_LOCAL:
+        coordinator.router.ubus_command = UBUS_CLI
+    return coordinator
+
+
+async def async_timed_refresh(coordinator: OpenwrtDataUpdateCoordinator) -> tuple[float, bool]:
+    start = time.perf_counter()
+    await coordinator.async_refresh()
+    return time.perf_counter() - start, coordinator.last_update_success
+
+
+async def async_bench(hass: HomeAssistant, session: aiohttp.ClientSession, base_url: str, routers: int, args) -> dict:
+    host = base_url.removeprefix("http://")
+    coordinators = [create_coordinator(hass, index, host, args) for index in range(routers)]
+
+    # the first refresh logs in and discovers the radios, keep it out of the numbers
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+    await session.delete(f"{base_url}/stats")
+
+    latencies = []
+    failures = 0
+    cpu_start = time.process_time()
+    for _ in range(args.refreshes):
+        for latency, success in await asyncio.gather(
+            *(async_timed_refresh(coordinator) for coordinator in coordinators)
+        ):
+            latencies.append(latency)
+            failures += not success
+    cpu = time.process_time() - cpu_start
+
+    async with session.get(f"{base_url}/stats") as response:
+        server = await response.json()
+
+    for coordinator in coordinators:
+        await coordinator.async_close()
+
+    refreshes = routers * args.refreshes
+    return {
+        "routers": routers,
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p90": percentile(latencies, 0.9) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "max": max(latencies) * 1000,
+        "requests": server["http_requests"] / refreshes,
+        "calls": server["calls"] / refreshes,
+        "kib": server["bytes_out"] / refreshes / 1024,
+        "cpu": cpu / refreshes * 1000,
+        "failed": failures,
+    }
+
+
+async def async_wait_for_server(session: aiohttp.ClientSession, base_url: str) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            async with session.get(f"{base_url}/stats"):
+                return
+        except aiohttp.ClientError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def async_main(args, server_args: list[str]) -> None:
+    base_url = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory() as config_dir:
+        args.socket = str(Path(config_dir) / "ubus.sock")
+        server = subprocess.Popen(
+            [sys.executable, str(ROOT / "benchmarks" / "fake_ubus.py"), "--port", str(args.port),
+             "--socket", args.socket, *server_args]
+        )
+        try:
+            hass = create_hass(config_dir)
+            async with aiohttp.ClientSession() as session:
+                await async_wait_for_server(session, base_url)
+                print(f"{'routers':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+                      f"{'req/ref':>8} {'calls/ref':>9} {'KiB/ref':>8} {'cpu ms/ref':>10} {'failed':>6}")
+                for routers in args.routers:
+                    result = await async_bench(hass, session, base_url, routers, args)
+                    print(f"{result['routers']:>7} {result['p50']:>8.1f} {result['p90']:>8.1f} "
+                          f"{result['p99']:>8.1f} {result['max']:>8.1f} {result['requests']:>8.2f} "
+                          f"{result['calls']:>9.2f} {result['kib']:>8.1f} {result['cpu']:>10.2f} "
+                          f"{result['failed']:>6}")
+            await hass.async_stop(force=True)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routers", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--refreshes", type=int, default=20, help="measured refreshes per router")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--transport", choices=(TRANSPORT_HTTP, TRANSPORT_LOCAL), default=TRANSPORT_HTTP)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    asyncio.run(async_main(args, arguments_from_options(options_from_args(args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""Local stand-in for uhttpd-mod-ubus/rpcd used by the benchmarks.
+
+Serves the /ubus JSON-RPC endpoint for the calls the integration makes, with
+configurable latency, error injection and payload sizes. Request counters are
+available from GET /stats and reset with DELETE /stats.
+
+With --socket the same router also answers on a unix socket, one JSON request
+line per connection, for fake_ubus_cli.py which stands in for the ubus tool of
+the local transport:
+
+    python benchmarks/fake_ubus.py --port 8080 --clients 200 --latency 20
+    python benchmarks/fake_ubus.py --socket /tmp/ubus.sock
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+import json
+import random
+import secrets
+import time
+
+from aiohttp import web
+
+SESSION_TIMEOUT = 300
+
+
+@dataclass
+class FakeOptions:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    http_error_rate: float = 0.0
+    radios: int = 2
+    clients: int = 20
+    history: int = 120
+    batch: bool = True
+    plugin: bool = False
+    password: str = ""
+
+
+class FakeRouter:
+    """State and replies of one emulated OpenWrt router."""
+
+    def __init__(self, options: FakeOptions) -> None:
+        self.options = options
+        self.started = time.time()
+        self.sessions = set()
+        self.stats = {"http_requests": 0, "calls": 0, "batches": 0, "errors": 0, "bytes_out": 0}
+        self.radios = [f"wlan{index}" for index in range(options.radios)]
+        self.clients = {
+            radio: [
+                ":".join(f"{byte:02x}" for byte in (0x02, index, *random.randbytes(4)))
+                for _ in range(options.clients)
+            ]
+            for index, radio in enumerate(self.radios)
+        }
+        self.devices = ["br-lan", "eth0", "wan", *self.radios]
+
+    def counters(self, device: str) -> tuple[int, int]:
+        elapsed = time.time() - self.started
+        seed = sum(device.encode())
+        return int(elapsed * (1_000_000 + seed)), int(elapsed * (200_000 + seed))
+
+    def board(self, _params: dict):
+        return {
+            "kernel": "5.15.137",
+            "hostname": "OpenWrt",
+            "system": "Fake CPU",
+            "model": "Fake Router",
+            "board_name": "fake,router",
+            "release": {
+                "distribution": "OpenWrt",
+                "version": "23.05.2",
+                "revision": "r23630-842932a63d",
+                "target": "x86/64",
+                "description": "OpenWrt 23.05.2 r23630-842932a63d",
+            },
+        }
+
+    def info(self, _params: dict):
+        elapsed = int(time.time() - self.started)
+        return {
+            "localtime": int(time.time()),
+            "uptime": elapsed,
+            "load": [21024, 18432, 16384],
+            "memory": {"total": 1024 * 1024 * 1024, "free": 512 * 1024 * 1024, "shared": 0,
+                       "buffered": 0, "available": 600 * 1024 * 1024, "cached": 100 * 1024 * 1024},
+            "swap": {"total": 0, "free": 0},
+        }
+
+    def proc_stat(self) -> str:
+        elapsed = time.time() - self.started
+        user, system, idle = int(elapsed * 30), int(elapsed * 10), int(elapsed * 360)
+        return f"cpu  {user} 0 {system} {idle} 0 0 0 0 0 0\nintr 0\n"
+
+    def read_file(self, params: dict):
+        if params.get("path") == "/proc/stat":
+            return {"data": self.proc_stat()}
+        if params.get("path") == "/proc/sys/net/netfilter/nf_conntrack_count":
+            return {"data": f"{self.options.clients * self.options.radios * 8}\n"}
+        return None
+
+    def network_devices(self, _params: dict):
+        return {
+            device: {
+                "name": device,
+                "up": True,
+                "wireless": device in self.radios,
+                "stats": dict(zip(("rx_bytes", "tx_bytes"), self.counters(device))),
+            }
+            for device in self.devices
+        }
+
+    def device_status(self, _params: dict):
+        result = {}
+        for device in self.devices:
+            rx_bytes, tx_bytes = self.counters(device)
+            result[device] = {
+                "up": True,
+                "statistics": {"rx_bytes": rx_bytes, "tx_bytes": tx_bytes,
+                               "rx_packets": rx_bytes // 1000, "tx_packets": tx_bytes // 1000},
+            }
+        return result
+
+    def wireless_status(self, _params: dict):
+        return {
+            f"radio{index}": {
+                "up": True,
+                "pending": False,
+                "interfaces": [{"section": f"default_radio{index}", "ifname": radio}],
+            }
+            for index, radio in enumerate(self.radios)
+        }
+
+    def assoclist(self, params: dict):
+        if (clients := self.clients.get(params.get("device"))) is None:
+            return None
+        return {
+            "results": [
+                {
+                    "mac": mac.upper(),
+                    "signal": -40 - index % 40,
+                    "noise": -95,
+                    "inactive": index * 10,
+                    "rx": {"rate": 866700, "mhz": 80, "bytes": index * 123456, "packets": index * 100},
+                    "tx": {"rate": 780000, "mhz": 80, "bytes": index * 654321, "packets": index * 200},
+                }
+                for index, mac in enumerate(clients)
+            ]
+        }
+
+    def iwinfo_info(self, params: dict):
+        if (index := self.radio_index(params.get("device"))) is None:
+            return None
+        return {
+            "phy": f"phy{index}",
+            "ssid": "OpenWrt",
+            "mode": "Master",
+            "channel": 36 + index * 16,
+            "frequency": 5180 + index * 80,
+            "txpower": 20,
+            "noise": -95,
+            "bitrate": 866700,
+            "quality": 70,
+            "quality_max": 70,
+        }
+
+    def survey(self, params: dict):
+        if (index := self.radio_index(params.get("device"))) is None:
+            return None
+        elapsed = int((time.time() - self.started) * 1000)
+        return {
+            "results": [
+                {
+                    "mhz": 5180 + channel * 20,
+                    "noise": -95,
+                    "active_time": elapsed,
+                    "busy_time": elapsed // (3 if channel == index * 4 else 10),
+                    "busy_time_ext": 0,
+                    "busy_time_rx": elapsed // 20,
+                    "busy_time_tx": elapsed // 30,
+                }
+                for channel in range(len(self.radios) * 4)
+            ]
+        }
+
+    def radio_index(self, device):
+        return self.radios.index(device) if device in self.radios else None
+
+    def dhcp_leases(self, _params: dict):
+        return {
+            "dhcp_leases": [
+                {"expires": 43200, "hostname": f"client-{radio}-{index}", "macaddr": mac, "ipaddr": f"192.168.1.{index + 2}"}
+                for radio, clients in self.clients.items()
+                for index, mac in enumerate(clients)
+            ],
+            "dhcp6_leases": [],
+        }
+
+    def realtime_stats(self, params: dict):
+        if params.get("device") not in self.devices:
+            return None
+        rx_bytes, tx_bytes = self.counters(params["device"])
+        now = int(time.time())
+        count = self.options.history
+        return {
+            "result": [
+                [now - (count - index), rx_bytes - (count - index) * 1000, 0,
+                 tx_bytes - (count - index) * 200, 0]
+                for index in range(count)
+            ]
+        }
+
+    def snapshot(self, _params: dict):
+        """Reply of the ha-openwrt rpcd plugin."""
+        devices = {}
+        for device in self.devices:
+            rx_bytes, tx_bytes = self.counters(device)
+            devices[device] = {"rx_bytes": rx_bytes, "tx_bytes": tx_bytes, "wireless": device in self.radios}
+        return {
+            "board": self.board({}),
+            "info": self.info({}),
+            "cpu": self.proc_stat().split("\n", 1)[0],
+            "conntrack": self.options.clients * self.options.radios * 8,
+            "devices": devices,
+            "clients": {radio: len(clients) for radio, clients in self.clients.items()},
+        }
+
+    def objects(self, pattern: str) -> dict:
+        """Reply of a JSON-RPC list request, only the plugin object is listed."""
+        if self.options.plugin and pattern in ("ha-openwrt", "*"):
+            return {"ha-openwrt": {"snapshot": {}}}
+        return {}
+
+    def call(self, session: str, subsystem: str, method: str, params: dict):
+        """Return the ubus reply list of one call, or raise LookupError for unknown objects."""
+        if (subsystem, method) == ("session", "login"):
+            if params.get("password", "") != self.options.password:
+                return [6]
+            session_id = secrets.token_hex(16)
+            self.sessions.add(session_id)
+            return [0, {"ubus_rpc_session": session_id, "timeout": SESSION_TIMEOUT, "expires": SESSION_TIMEOUT}]
+
+        if session not in self.sessions:
+            raise PermissionError
+
+        return self.dispatch(subsystem, method, params)
+
+    def dispatch(self, subsystem: str, method: str, params: dict):
+        handler = {
+            ("system", "board"): self.board,
+            ("system", "info"): self.info,
+            ("luci-rpc", "getNetworkDevices"): self.network_devices,
+            ("luci-rpc", "getDHCPLeases"): self.dhcp_leases,
+            ("network.device", "status"): self.device_status,
+            ("network.wireless", "status"): self.wireless_status,
+            ("iwinfo", "assoclist"): self.assoclist,
+            ("iwinfo", "info"): self.iwinfo_info,
+            ("iwinfo", "survey"): self.survey,
+            ("luci", "getRealtimeStats"): self.realtime_stats,
+            ("file", "read"): self.read_file,
+            **({("ha-openwrt", "snapshot"): self.snapshot} if self.options.plugin else {}),
+        }.get((subsystem, method))
+        if handler is None:
+            raise LookupError
+        if (result := handler(params)) is None:
+            return [4]
+        return [0, result]
+
+    def reply(self, request: dict) -> dict:
+        self.stats["calls"] += 1
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        if random.random() < self.options.error_rate:
+            self.stats["errors"] += 1
+            reply["error"] = {"code": -32002, "message": "Injected error"}
+            return reply
+
+        try:
+            if request.get("method") == "list":
+                session, pattern = request["params"]
+                if session not in self.sessions:
+                    raise PermissionError
+                reply["result"] = self.objects(pattern)
+                return reply
+            session, subsystem, method, params = request["params"]
+            reply["result"] = self.call(session, subsystem, method, params)
+        except PermissionError:
+            reply["error"] = {"code": -32002, "message": "Access denied"}
+        except (LookupError, ValueError, TypeError):
+            reply["error"] = {"code": -32000, "message": "Object not found"}
+        return reply
+
+    async def handle_ubus(self, request: web.Request) -> web.Response:
+        self.stats["http_requests"] += 1
+        if self.options.latency or self.options.jitter:
+            await asyncio.sleep((self.options.latency + random.random() * self.options.jitter) / 1000)
+
+        if random.random() < self.options.http_error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=500)
+
+        body = json.loads(await request.read())
+        if isinstance(body, list):
+            if not self.options.batch:
+                return web.json_response(
+                    {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid request"}},
+                    status=400,
+                )
+            self.stats["batches"] += 1
+            reply = [self.reply(item) for item in body]
+        else:
+            reply = self.reply(body)
+
+        text = json.dumps(reply)
+        self.stats["bytes_out"] += len(text)
+        return web.Response(text=text, content_type="application/json")
+
+    async def handle_socket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer one {"object", "method", "params"} or {"list"} line with a {"status", "result"} line."""
+        self.stats["http_requests"] += 1
+        self.stats["calls"] += 1
+        try:
+            request = json.loads(await reader.readline())
+            if self.options.latency or self.options.jitter:
+                await asyncio.sleep((self.options.latency + random.random() * self.options.jitter) / 1000)
+
+            if random.random() < self.options.error_rate:
+                self.stats["errors"] += 1
+                reply = [5]
+            elif "list" in request:
+                # ubus list fails with not found when no object matches
+                reply = [0, objects] if (objects := self.objects(request["list"])) else [4]
+            else:
+                try:
+                    reply = self.dispatch(request["object"], request["method"], request.get("params") or {})
+                except (LookupError, ValueError, TypeError):
+                    reply = [4]
+
+            text = json.dumps({"status": reply[0], "result": reply[1] if len(reply) > 1 else None}) + "\n"
+            self.stats["bytes_out"] += len(text)
+            writer.write(text.encode())
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        if request.method == "DELETE":
+            self.stats = dict.fromkeys(self.stats, 0)
+        return web.json_response(self.stats)
+
+
+def create_app(options: FakeOptions, socket: str | None = None) -> web.Application:
+    router = FakeRouter(options)
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+
+    if socket is not None:
+        async def serve_socket(app: web.Application):
+            server = await asyncio.start_unix_server(router.handle_socket, socket)
+            yield
+            server.close()
+            await server.wait_closed()
+
+        app.cleanup_ctx.append(serve_socket)
+
+    app.router.add_post("/ubus", router.handle_ubus)
+    app.router.add_route("GET", "/stats", router.handle_stats)
+    app.router.add_route("DELETE", "/stats", router.handle_stats)
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency up to this many ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with an error")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--radios", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=20, help="associated clients per radio")
+    parser.add_argument("--history", type=int, default=120, help="rows of realtime stats history")
+    parser.add_argument("--no-batch", dest="batch", action="store_false", help="reject JSON-RPC batches")
+    parser.add_argument("--plugin", action="store_true", help="emulate the ha-openwrt rpcd plugin")
+    parser.add_argument("--password", default="")
+
+
+def options_from_args(args: argparse.Namespace) -> FakeOptions:
+    return FakeOptions(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        http_error_rate=args.http_error_rate,
+        radios=args.radios,
+        clients=args.clients,
+        history=args.history,
+        batch=args.batch,
+        plugin=args.plugin,
+        password=args.password,
+    )
+
+
+def arguments_from_options(options: FakeOptions) -> list[str]:
+    """Return the command line that recreates `options`."""
+    arguments = [
+        "--latency", str(options.latency),
+        "--jitter", str(options.jitter),
+        "--error-rate", str(options.error_rate),
+        "--http-error-rate", str(options.http_error_rate),
+        "--radios", str(options.radios),
+        "--clients", str(options.clients),
+        "--history", str(options.history),
+        "--password", options.password,
+    ]
+    if not options.batch:
+        arguments.append("--no-batch")
+    if options.plugin:
+        arguments.append("--plugin")
+    return arguments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--socket", help="also serve the local transport on this unix socket")
+    add_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(create_app(options_from_args(args), args.socket), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
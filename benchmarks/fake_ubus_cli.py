@@ -0,0 +1,68 @@
+"""Stand-in for the ubus command line tool, backed by fake_ubus.py --socket.
+
+Understands the subset of the ubus tool the local transport uses:
+
+    fake_ubus_cli.py [-S] [-s socket] [-t timeout] call <object> <method> [<json>]
+    fake_ubus_cli.py [-S] [-s socket] [-t timeout] list [<path>]
+
+Replies are printed as compact JSON, `list` prints one object name per line,
+and the exit status is the ubus status code, like the real tool. Failing to
+connect exits with 255. `subscribe` is not supported and fails with status 4.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import sys
+
+DEFAULT_SOCKET = "/var/run/ubus/ubus.sock"
+STATUS_NOT_FOUND = 4
+STATUS_TIMEOUT = 7
+# the real tool returns -1 when it cannot connect to ubusd
+EXIT_CONNECT_FAILED = 255
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-S", dest="simple", action="store_true")
+    parser.add_argument("-s", dest="socket", default=DEFAULT_SOCKET)
+    parser.add_argument("-t", dest="timeout", type=float, default=30)
+    parser.add_argument("command")
+    parser.add_argument("arguments", nargs="*")
+    args = parser.parse_args()
+
+    if args.command == "call" and len(args.arguments) in (2, 3):
+        subsystem, method, *params = args.arguments
+        request = {"object": subsystem, "method": method, "params": json.loads(params[0]) if params else {}}
+    elif args.command == "list" and len(args.arguments) <= 1:
+        request = {"list": args.arguments[0] if args.arguments else "*"}
+    else:
+        print("Command failed: Not found", file=sys.stderr)
+        return STATUS_NOT_FOUND
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(args.timeout)
+            connection.connect(args.socket)
+            connection.sendall(json.dumps(request).encode() + b"\n")
+            reply = json.loads(connection.makefile("rb").readline())
+    except TimeoutError:
+        print("Command failed: Request timed out", file=sys.stderr)
+        return STATUS_TIMEOUT
+    except OSError:
+        print("Failed to connect to ubus", file=sys.stderr)
+        return EXIT_CONNECT_FAILED
+
+    if reply["status"]:
+        print(f"Command failed: status {reply['status']}", file=sys.stderr)
+    elif "list" in request:
+        for name in reply["result"]:
+            print(name)
+    elif reply["result"] is not None:
+        print(json.dumps(reply["result"], separators=(",", ":")))
+    return reply["status"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,14 +3,17 @@ import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform, CONF_NAME
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
 
-from .const import DOMAIN
+from .const import DATA_FLEET, DOMAIN
 
 from .coordinator import OpenwrtDataUpdateCoordinator
+from .router import STORAGE_KEY_METADATA, STORAGE_KEY_SESSION, STORAGE_VERSION
+from .fleet import FleetScheduler
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.SENSOR, Platform.BUTTON]
+PLATFORMS = [Platform.SENSOR, Platform.BUTTON, Platform.DEVICE_TRACKER]
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -18,10 +21,26 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     coordinator = OpenwrtDataUpdateCoordinator(
         hass, config=entry.data)
+    # also runs when the first refresh raises ConfigEntryNotReady, so every
+    # setup attempt closes the connection pool of its router
+    entry.async_on_unload(coordinator.async_close)
 
-    await coordinator.async_config_entry_first_refresh()
+    await coordinator.router.async_load_session()
+    if await coordinator.async_load_metadata():
+        # entities come up from what the last run saved, their data follows in the background
+        coordinator.data = {}
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} {entry.title} first refresh"
+        )
+    else:
+        await coordinator.async_config_entry_first_refresh()
 
     hass.data[DOMAIN][entry.entry_id] = coordinator
+    coordinator.router.async_start_session_renewal()
+
+    if DATA_FLEET not in hass.data:
+        hass.data[DATA_FLEET] = FleetScheduler(hass)
+    hass.data[DATA_FLEET].async_add(coordinator)
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
@@ -33,6 +52,13 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
     unload_ok = await hass.config_entries.async_unload_platforms(
         config_entry, PLATFORMS
     )
-    hass.data[DOMAIN].pop(config_entry.entry_id)
+    coordinator = hass.data[DOMAIN].pop(config_entry.entry_id)
+    hass.data[DATA_FLEET].async_remove(coordinator)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored ubus session and router metadata of a deleted entry."""
+    await Store(hass, STORAGE_VERSION, STORAGE_KEY_SESSION.format(entry.entry_id)).async_remove()
+    await Store(hass, STORAGE_VERSION, STORAGE_KEY_METADATA.format(entry.entry_id)).async_remove()
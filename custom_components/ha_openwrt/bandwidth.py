@@ -0,0 +1,186 @@
+"""Bandwidth calculation from cumulative interface byte counters."""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+import math
+import time
+
+from .const import DOWNLOAD, UPLOAD
+
+COUNTER32_MAX = 2**32
+# a counter dropping from above this value is taken as a 32 bit wraparound,
+# any other drop means the interface was reset
+COUNTER32_WRAP_FLOOR = COUNTER32_MAX * 3 // 4
+
+
+def counter_delta(previous: int, current: int) -> int | None:
+    """Return the increase of a byte counter, None if it was reset."""
+    if current >= previous:
+        return current - previous
+    if COUNTER32_WRAP_FLOOR <= previous < COUNTER32_MAX:
+        return current + COUNTER32_MAX - previous
+    return None
+
+
+def rates_from_history(history: list) -> dict | None:
+    """Return the rates of the last two rows of a luci realtime stats history."""
+    if len(history) < 2:
+        return None
+
+    elapsed = history[-1][0] - history[-2][0]
+    if elapsed <= 0:
+        return None
+
+    return {
+        DOWNLOAD: (history[-1][1] - history[-2][1]) / elapsed,
+        UPLOAD: (history[-1][3] - history[-2][3]) / elapsed,
+    }
+
+
+class BandwidthMeter:
+    """Keep the previous counter sample of each interface and derive rates."""
+
+    def __init__(self) -> None:
+        self._samples = {}
+
+    def update(self, device: str, rx_bytes: int, tx_bytes: int, timestamp: float = None) -> dict | None:
+        """Record a sample, return the rates since the previous one if there is any."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        previous = self._samples.get(device)
+        self._samples[device] = (timestamp, rx_bytes, tx_bytes)
+        if previous is None:
+            return None
+
+        elapsed = timestamp - previous[0]
+        if elapsed <= 0:
+            return None
+
+        rx_delta = counter_delta(previous[1], rx_bytes)
+        tx_delta = counter_delta(previous[2], tx_bytes)
+        if rx_delta is None or tx_delta is None:
+            return None
+
+        return {
+            DOWNLOAD: rx_delta / elapsed,
+            UPLOAD: tx_delta / elapsed,
+        }
+
+    def reset(self, device: str) -> None:
+        self._samples.pop(device, None)
+
+
+STATISTIC_EWMA = "ewma"
+STATISTIC_AVERAGE_1M = "average_1m"
+STATISTIC_AVERAGE_5M = "average_5m"
+STATISTIC_AVERAGE_15M = "average_15m"
+STATISTIC_PEAK = "peak"
+
+AVERAGE_WINDOWS = (
+    (STATISTIC_AVERAGE_1M, 60),
+    (STATISTIC_AVERAGE_5M, 300),
+    (STATISTIC_AVERAGE_15M, 900),
+)
+PEAK_WINDOW = 900
+# seconds for the smoothed rate to cover ~63% of a step
+EWMA_TIME_CONSTANT = 30
+# enough for the longest window at one sample per second
+RING_SIZE = 1024
+
+
+class RateStatistics:
+    """Smoothed, windowed average and peak rate of one interface direction.
+
+    Samples live in a fixed size ring buffer of flat arrays. Every window keeps
+    running sums that are updated as samples enter and leave it, and the peak
+    comes from a monotonic queue, so adding a sample is amortized O(1).
+    """
+
+    __slots__ = (
+        "_timestamps", "_durations", "_amounts", "_size", "_head", "_count",
+        "_window_counts", "_window_amounts", "_window_durations", "_peaks", "_last", "ewma",
+    )
+
+    def __init__(self, size: int = RING_SIZE) -> None:
+        self._timestamps = array("d", bytes(8 * size))
+        self._durations = array("d", bytes(8 * size))
+        self._amounts = array("d", bytes(8 * size))
+        self._size = size
+        self._head = 0
+        self._count = 0
+        self._window_counts = [0] * len(AVERAGE_WINDOWS)
+        self._window_amounts = [0.0] * len(AVERAGE_WINDOWS)
+        self._window_durations = [0.0] * len(AVERAGE_WINDOWS)
+        self._peaks = deque()
+        self._last = None
+        self.ewma = None
+
+    def _drop(self, window: int) -> None:
+        """Remove the oldest sample of a window from its sums."""
+        index = (self._head - self._window_counts[window]) % self._size
+        self._window_amounts[window] -= self._amounts[index]
+        self._window_durations[window] -= self._durations[index]
+        self._window_counts[window] -= 1
+        if not self._window_counts[window]:
+            # no rounding left over from the running sums
+            self._window_amounts[window] = 0.0
+            self._window_durations[window] = 0.0
+
+    def _prune(self, timestamp: float) -> None:
+        """Drop the samples and peaks that fell out of their windows by `timestamp`."""
+        for window, (_, seconds) in enumerate(AVERAGE_WINDOWS):
+            while self._window_counts[window] and self._timestamps[
+                (self._head - self._window_counts[window]) % self._size
+            ] <= timestamp - seconds:
+                self._drop(window)
+        while self._peaks and self._peaks[0][0] <= timestamp - PEAK_WINDOW:
+            self._peaks.popleft()
+
+    def add(self, timestamp: float, rate: float | None) -> None:
+        """Add the rate measured between the previous call and `timestamp`.
+
+        A None rate marks a gap, the next rate is then only measured from here.
+        Windows still move on during a gap, so they empty out when rates stop.
+        """
+        last, self._last = self._last, timestamp
+        if rate is None or last is None or timestamp <= last:
+            self._prune(timestamp)
+            return
+
+        duration = timestamp - last
+        if self.ewma is None:
+            self.ewma = rate
+        else:
+            self.ewma += (1 - math.exp(-duration / EWMA_TIME_CONSTANT)) * (rate - self.ewma)
+
+        if self._count == self._size:
+            # the slot at head holds the oldest sample, drop it from windows still covering it
+            for window, count in enumerate(self._window_counts):
+                if count == self._size:
+                    self._drop(window)
+
+        self._timestamps[self._head] = timestamp
+        self._durations[self._head] = duration
+        self._amounts[self._head] = rate * duration
+        self._head = (self._head + 1) % self._size
+        self._count = min(self._count + 1, self._size)
+
+        for window in range(len(AVERAGE_WINDOWS)):
+            self._window_counts[window] += 1
+            self._window_amounts[window] += rate * duration
+            self._window_durations[window] += duration
+
+        while self._peaks and self._peaks[-1][1] <= rate:
+            self._peaks.pop()
+        self._peaks.append((timestamp, rate))
+        self._prune(timestamp)
+
+    def snapshot(self) -> dict:
+        statistics = {STATISTIC_EWMA: self.ewma}
+        for window, (name, _) in enumerate(AVERAGE_WINDOWS):
+            duration = self._window_durations[window]
+            statistics[name] = max(self._window_amounts[window], 0) / duration if duration > 0 else None
+        statistics[STATISTIC_PEAK] = self._peaks[0][1] if self._peaks else None
+        return statistics
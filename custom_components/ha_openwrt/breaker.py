@@ -0,0 +1,91 @@
+"""Stop calling a router that is down and probe it cheaply until it is back."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+# consecutive failed requests that open the circuit
+FAILURE_THRESHOLD = 3
+PROBE_MIN_DELAY = 5
+PROBE_MAX_DELAY = 300
+
+
+class RouterUnreachable(ConnectionError):
+    """Raised instead of calling a router while its circuit is open."""
+
+
+async def async_tcp_probe(host: str, port: int, timeout: float) -> bool:
+    """Return whether a TCP connection to host:port can be opened."""
+    try:
+        async with asyncio.timeout(timeout):
+            _, writer = await asyncio.open_connection(host, port)
+    except (OSError, TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+class CircuitBreaker:
+    """Track whether requests to a router are worth making.
+
+    After FAILURE_THRESHOLD consecutive failures the circuit opens, requests are
+    refused without touching the network and only a liveness probe is made,
+    backed off exponentially from PROBE_MIN_DELAY to PROBE_MAX_DELAY. Once a probe
+    gets through the next request is let out, and the circuit closes when it
+    succeeds.
+    """
+
+    __slots__ = ("failures", "is_open", "opened", "_delay", "_probe_after")
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.is_open = False
+        self.opened = None
+        self._delay = 0
+        self._probe_after = 0
+
+    @property
+    def probe_in(self) -> float:
+        """Seconds until the next probe is due."""
+        return max(self._probe_after - time.monotonic(), 0)
+
+    def probe_due(self) -> bool:
+        return time.monotonic() >= self._probe_after
+
+    def _back_off(self) -> None:
+        self._delay = min(max(self._delay * 2, PROBE_MIN_DELAY), PROBE_MAX_DELAY)
+        self._probe_after = time.monotonic() + self._delay
+
+    def success(self) -> bool:
+        """Record a successful request, return whether the circuit closed."""
+        was_open = self.is_open
+        self.failures = 0
+        self.is_open = False
+        self.opened = None
+        self._delay = 0
+        return was_open
+
+    def failure(self) -> bool:
+        """Record a failed request, return whether the circuit opened."""
+        self.failures += 1
+        if self.is_open:
+            # the request let out after a successful probe failed as well
+            self._back_off()
+            return False
+        if self.failures < FAILURE_THRESHOLD:
+            return False
+        self.is_open = True
+        self.opened = time.time()
+        self._back_off()
+        return True
+
+    def probe_failed(self) -> None:
+        self._back_off()
+
+    def as_dict(self) -> dict:
+        return {
+            "open": self.is_open,
+            "failures": self.failures,
+            "opened": self.opened,
+            "probe_in": self.probe_in if self.is_open else None,
+        }
@@ -7,7 +7,7 @@ from homeassistant.components.button import ButtonEntity, ButtonDeviceClass
 from homeassistant.core import HomeAssistant
 from homeassistant.const import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from .coordinator import OpenwrtRouter
+from .router import OpenwrtRouter
 
 from .const import (
     CONF_BUTTON_REBOOT,
@@ -0,0 +1,287 @@
+"""Wireless client tracking from assoclist snapshots and hostapd ubus events."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+import aiohttp
+
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .bandwidth import BandwidthMeter
+from .leases import LeaseIndex
+from .router import SubscriptionsUnsupported
+from .const import (
+    API_SUBSYS_HOSTAPD,
+    DOMAIN,
+    DOWNLOAD,
+    SIGNAL_CLIENT_NEW,
+    SIGNAL_CLIENT_THROUGHPUT_UPDATE,
+    SIGNAL_CLIENT_TRACKER_UPDATE,
+    UPLOAD
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_ASSOC = "assoc"
+EVENT_DISASSOC = "disassoc"
+
+# poll assoclist this often as a safety net while events are flowing
+RECONCILE_INTERVAL = 300
+RECONNECT_MIN_DELAY = 5
+RECONNECT_MAX_DELAY = 300
+
+# smaller moves of a written signal strength (dB) or throughput are not written,
+# the throughput deadband is the larger of the floor (bytes/s) and the share
+SIGNAL_DEADBAND = 5
+THROUGHPUT_DEADBAND_FLOOR = 1024
+THROUGHPUT_DEADBAND_SHARE = 0.1
+# a station away this long is forgotten, its entities keep showing it as away
+CLIENT_TTL = 86400
+
+
+def _moved(written, value, deadband) -> bool:
+    if written is None or value is None:
+        return written != value
+    return abs(value - written) >= deadband
+
+
+class HostapdEventListener:
+    """Keep an in-memory client table up to date from hostapd assoc/disassoc events.
+
+    One event stream is held open per wireless interface. `on_change` is called
+    whenever the table changes because of an event.
+    """
+
+    def __init__(self, router, on_change: Callable[[], None]) -> None:
+        self.router = router
+        self._on_change = on_change
+        self.clients: dict[str, set[str]] = {}
+        self.connected: set[str] = set()
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @property
+    def active(self) -> bool:
+        """Return True while the stream of every interface is connected."""
+        return bool(self._tasks) and self.connected.issuperset(self._tasks)
+
+    @property
+    def count(self) -> int:
+        return sum(len(clients) for clients in self.clients.values())
+
+    @callback
+    def async_set_interfaces(self, interfaces: list[str]) -> None:
+        for interface in set(self._tasks) - set(interfaces):
+            self._tasks.pop(interface).cancel()
+            self.clients.pop(interface, None)
+            self.connected.discard(interface)
+
+        for interface in interfaces:
+            if interface not in self._tasks:
+                self._tasks[interface] = self.router.hass.async_create_background_task(
+                    self._async_listen(interface), f"{DOMAIN} {self.router.host} {interface} events"
+                )
+
+    @callback
+    def async_reconcile(self, clients: dict[str, set[str]]) -> None:
+        """Replace the client table with a polled assoclist snapshot."""
+        for interface, macs in clients.items():
+            if macs is not None:
+                self.clients[interface] = macs
+
+    async def _async_listen(self, interface: str) -> None:
+        path = API_SUBSYS_HOSTAPD.replace("*", interface)
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                async for event, data in self.router.async_subscribe(path):
+                    self.connected.add(interface)
+                    delay = RECONNECT_MIN_DELAY
+                    self._handle_event(interface, event, data)
+            except SubscriptionsUnsupported:
+                _LOGGER.warning("%s: event subscriptions are not supported, polling %s",
+                                self.router.host, interface)
+                return
+            except (aiohttp.ClientError, TimeoutError, ConnectionError, PermissionError, ValueError) as err:
+                _LOGGER.debug("%s: event stream of %s closed: %r", self.router.host, interface, err)
+            finally:
+                self.connected.discard(interface)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _handle_event(self, interface: str, event: str | None, data) -> None:
+        if event not in (EVENT_ASSOC, EVENT_DISASSOC) or not isinstance(data, dict):
+            return
+        if (address := data.get("address")) is None:
+            return
+
+        clients = self.clients.setdefault(interface, set())
+        address = address.lower()
+        if event == EVENT_ASSOC and address not in clients:
+            clients.add(address)
+        elif event == EVENT_DISASSOC and address in clients:
+            clients.discard(address)
+        else:
+            return
+
+        self._on_change()
+
+    async def async_stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self.connected.clear()
+
+
+class Client:
+    """Last known state of one wireless station."""
+
+    __slots__ = ("mac", "interface", "connected", "signal", "download", "upload", "hostname", "ip", "last_seen")
+
+    def __init__(self, mac: str) -> None:
+        self.mac = mac
+        self.hostname = None
+        self.ip = None
+        self.interface = None
+        self.connected = False
+        self.signal = None
+        self.download = None
+        self.upload = None
+        self.last_seen = None
+
+    @property
+    def tracker_state(self) -> tuple:
+        """Return what the tracker shows besides the signal strength."""
+        return (self.connected, self.interface, self.hostname, self.ip)
+
+
+class ClientRegistry:
+    """Per-station view of the assoclist snapshots, keyed by MAC.
+
+    Each snapshot is diffed against the previous one. New stations are announced
+    with SIGNAL_CLIENT_NEW so platforms can create their entities lazily. Every
+    entity of a station has a signal of its own, a tracker is only signalled when
+    its state changed or the signal strength moved by SIGNAL_DEADBAND, a throughput
+    sensor when its rate moved beyond the throughput deadband. Hostnames and
+    addresses come from the DHCP lease index, which is read far less often.
+    Stations away for CLIENT_TTL are dropped, so guests do not pile up.
+    """
+
+    def __init__(self, hass, entry_id: str) -> None:
+        self.hass = hass
+        self.entry_id = entry_id
+        self.clients: dict[str, Client] = {}
+        self.leases = LeaseIndex()
+        self._meter = BandwidthMeter()
+        # last values signalled, keyed by (mac, entity kind)
+        self._written: dict[tuple[str, str], object] = {}
+
+    @callback
+    def async_update(self, assoclists: dict[str, dict | None], timestamp: float = None) -> None:
+        """Apply the assoclist results of one refresh, keyed by interface.
+
+        Stations of an interface whose assoclist failed keep their previous state.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        new = []
+        present = set()
+        for interface, result in assoclists.items():
+            if not result:
+                continue
+            for station in result["results"]:
+                mac = station["mac"].lower()
+                present.add(mac)
+                if (client := self.clients.get(mac)) is None:
+                    client = self.clients[mac] = Client(mac)
+                    self._apply_lease(client)
+                    new.append(mac)
+
+                client.interface = interface
+                client.connected = True
+                client.last_seen = timestamp
+                client.signal = station.get("signal")
+                rx_bytes = station.get("rx", {}).get("bytes")
+                tx_bytes = station.get("tx", {}).get("bytes")
+                if rx_bytes is None or tx_bytes is None:
+                    continue
+                # the station downloads what the access point transmits
+                rates = self._meter.update(mac, tx_bytes, rx_bytes, timestamp) or {}
+                client.download = rates.get(DOWNLOAD)
+                client.upload = rates.get(UPLOAD)
+
+        polled = {interface for interface, result in assoclists.items() if result}
+        gone = []
+        for mac, client in self.clients.items():
+            if client.connected and mac not in present and client.interface in polled:
+                client.connected = False
+                client.download = None
+                client.upload = None
+                self._meter.reset(mac)
+            elif not client.connected and timestamp - client.last_seen >= CLIENT_TTL:
+                gone.append(mac)
+        for mac in gone:
+            del self.clients[mac]
+            for kind in ("tracker", DOWNLOAD, UPLOAD):
+                self._written.pop((mac, kind), None)
+
+        if new:
+            async_dispatcher_send(self.hass, SIGNAL_CLIENT_NEW.format(self.entry_id), new)
+
+        self._async_send_updates(self.clients)
+
+    def _apply_lease(self, client: Client) -> None:
+        lease = self.leases.get(client.mac)
+        client.hostname = None if lease is None else lease.hostname
+        client.ip = None if lease is None else lease.ip
+
+    @callback
+    def async_update_leases(self, leases: dict) -> bool:
+        """Apply a full read of the DHCP leases, return whether any lease changed.
+
+        Only clients whose lease changed are touched.
+        """
+        if not (changed := self.leases.update(leases)):
+            return False
+        for mac in changed:
+            if (client := self.clients.get(mac)) is not None:
+                self._apply_lease(client)
+        self._async_send_updates(changed)
+        return True
+
+    def _tracker_changed(self, client: Client) -> bool:
+        key = (client.mac, "tracker")
+        if (written := self._written.get(key)) is not None and written[0] == client.tracker_state and not _moved(
+            written[1], client.signal, SIGNAL_DEADBAND
+        ):
+            return False
+        self._written[key] = (client.tracker_state, client.signal)
+        return True
+
+    def _throughput_changed(self, client: Client, direction: str) -> bool:
+        key = (client.mac, direction)
+        rate = getattr(client, direction)
+        written = self._written.get(key)
+        deadband = max(THROUGHPUT_DEADBAND_FLOOR, (written or 0) * THROUGHPUT_DEADBAND_SHARE)
+        if key in self._written and not _moved(written, rate, deadband):
+            return False
+        self._written[key] = rate
+        return True
+
+    @callback
+    def _async_send_updates(self, macs) -> None:
+        for mac in macs:
+            if (client := self.clients.get(mac)) is None:
+                continue
+            if self._tracker_changed(client):
+                async_dispatcher_send(self.hass, SIGNAL_CLIENT_TRACKER_UPDATE.format(self.entry_id, mac))
+            for direction in (DOWNLOAD, UPLOAD):
+                if self._throughput_changed(client, direction):
+                    async_dispatcher_send(
+                        self.hass, SIGNAL_CLIENT_THROUGHPUT_UPDATE.format(self.entry_id, mac, direction)
+                    )
@@ -0,0 +1,31 @@
+"""JSON encoding of ubus requests and responses, using orjson when it is available."""
+from __future__ import annotations
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# bodies larger than this are decoded in the executor so the event loop keeps running
+EXECUTOR_THRESHOLD = 256 * 1024
+
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+async def async_loads(hass, body: bytes, decode=loads):
+    """Decode a response body, off the event loop when it is large."""
+    if len(body) > EXECUTOR_THRESHOLD:
+        return await hass.async_add_executor_job(decode, body)
+    return decode(body)
@@ -17,25 +17,89 @@ from homeassistant.const import (
 from homeassistant.core import callback
 
 from .const import (
+    CONF_ADAPTIVE_POLLING,
+    CONF_BANDWIDTH_DEADBAND,
     CONF_BANDWIDTH_DEVICES,
+    CONF_BANDWIDTH_INTERVAL,
     CONF_BUTTON_REBOOT,
     CONF_BUTTONS,
+    CONF_CLIENT_EVENTS,
+    CONF_CONNECT_TIMEOUT,
+    CONF_DEVICES_COUNT_INTERVAL,
+    CONF_READ_TIMEOUT,
     CONF_SENSOR_BANDWIDTH,
+    CONF_SENSOR_BANDWIDTH_STATISTICS,
+    CONF_SENSOR_CLIENTS,
+    CONF_SENSOR_SYSTEM,
+    CONF_SENSOR_TRAFFIC_HISTORY,
+    CONF_SENSOR_WIRELESS,
+    CONF_TOPOLOGY_TTL,
+    CONF_SSH_HOST_KEY,
+    CONF_SSH_PORT,
+    CONF_SSH_TRUST_NEW_HOST_KEY,
+    CONF_TRANSPORT,
+    CONF_UBUS_SOCKET,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_SSH_PORT,
+    DEFAULT_TOPOLOGY_TTL,
+    DEFAULT_UBUS_SOCKET,
     DOMAIN,
-    CONF_SENSOR_DEVICES_COUNT
+    CONF_SENSOR_DEVICES_COUNT,
+    TRANSPORT_HTTP,
+    TRANSPORT_LOCAL,
+    TRANSPORT_SSH
 )
+from .ubus_cli import check_local_ubus
 
 _LOGGER = logging.getLogger(__name__)
 
 SENSORS = [
     CONF_SENSOR_DEVICES_COUNT,
-    CONF_SENSOR_BANDWIDTH
+    CONF_SENSOR_BANDWIDTH,
+    CONF_SENSOR_BANDWIDTH_STATISTICS,
+    CONF_SENSOR_CLIENTS,
+    CONF_SENSOR_SYSTEM,
+    CONF_SENSOR_WIRELESS,
+    CONF_SENSOR_TRAFFIC_HISTORY
 ]
 
 BUTTONS = [
     CONF_BUTTON_REBOOT
 ]
 
+# per-kind intervals, unset ones follow CONF_SCAN_INTERVAL
+INTERVALS = [
+    CONF_DEVICES_COUNT_INTERVAL,
+    CONF_BANDWIDTH_INTERVAL
+]
+
+TRANSPORTS = [
+    TRANSPORT_HTTP,
+    TRANSPORT_LOCAL,
+    TRANSPORT_SSH
+]
+
+
+def _drop_default_intervals(user_input):
+    """Remove and return the per-kind intervals that only repeat the main one.
+
+    Left out, they follow the main interval when it changes later.
+    """
+    dropped = [key for key in INTERVALS if user_input.get(key) in (None, user_input[CONF_SCAN_INTERVAL])]
+    for key in dropped:
+        user_input.pop(key, None)
+    return dropped
+
+
+async def _async_check_transport(hass, user_input):
+    """Return the error key if the chosen transport cannot work where Home Assistant runs."""
+    if user_input.get(CONF_TRANSPORT) != TRANSPORT_LOCAL:
+        return None
+    return await hass.async_add_executor_job(
+        check_local_ubus, user_input.get(CONF_UBUS_SOCKET) or DEFAULT_UBUS_SOCKET
+    )
+
 
 class OpenwrtFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
@@ -45,8 +109,12 @@ class OpenwrtFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
-            name = user_input[CONF_NAME]
-            return self.async_create_entry(title=name, data=user_input)
+            if error := await _async_check_transport(self.hass, user_input):
+                errors["base"] = error
+            else:
+                _drop_default_intervals(user_input)
+                name = user_input[CONF_NAME]
+                return self.async_create_entry(title=name, data=user_input)
 
         return self.async_show_form(
             step_id="user",
@@ -54,6 +122,13 @@ class OpenwrtFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                     {
                         vol.Required(CONF_NAME): cv.string,
                         vol.Required(CONF_HOST, default="192.168.1.1"): cv.string,
+                        vol.Required(CONF_TRANSPORT, default=TRANSPORT_HTTP): selector.SelectSelector(
+                            selector.SelectSelectorConfig(
+                                options=TRANSPORTS, translation_key=CONF_TRANSPORT
+                            ),
+                        ),
+                        vol.Optional(CONF_UBUS_SOCKET, default=DEFAULT_UBUS_SOCKET): cv.string,
+                        vol.Optional(CONF_SSH_PORT, default=DEFAULT_SSH_PORT): cv.port,
                         vol.Required(CONF_USERNAME, default="root"): cv.string,
                         vol.Optional(CONF_PASSWORD): cv.string,
                         vol.Required(CONF_SSL, default=False): cv.boolean,
@@ -69,11 +144,81 @@ class OpenwrtFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                             ),
                             vol.Coerce(int)
                         ),
+                        vol.Optional(CONF_DEVICES_COUNT_INTERVAL): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Optional(CONF_BANDWIDTH_INTERVAL): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Optional(CONF_BANDWIDTH_DEADBAND, default=0): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=0,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="B/s",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Required(CONF_ADAPTIVE_POLLING, default=False): cv.boolean,
+                        vol.Required(CONF_TOPOLOGY_TTL, default=DEFAULT_TOPOLOGY_TTL): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=30,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Required(CONF_CONNECT_TIMEOUT, default=DEFAULT_CONNECT_TIMEOUT): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    max=120,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Required(CONF_READ_TIMEOUT, default=DEFAULT_READ_TIMEOUT): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    max=120,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
                         vol.Optional(CONF_SENSORS): selector.SelectSelector(
                             selector.SelectSelectorConfig(
                                 options=SENSORS, translation_key=CONF_SENSORS, multiple=True
                             ),
                         ),
+                        vol.Required(CONF_CLIENT_EVENTS, default=False): cv.boolean,
                         vol.Required(CONF_BANDWIDTH_DEVICES, default="wan,br-lan"): cv.string,
                         vol.Required(CONF_BUTTONS, default=[]): selector.SelectSelector(
                             selector.SelectSelectorConfig(
@@ -99,7 +244,16 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         self.config = dict(config_entry.data)
 
     async def async_step_init(self, user_input=None):
-        if user_input is not None:
+        errors = {}
+
+        if user_input is not None and (error := await _async_check_transport(self.hass, user_input)):
+            errors["base"] = error
+        elif user_input is not None:
+            # the key of the next ssh connection gets pinned instead
+            if user_input.pop(CONF_SSH_TRUST_NEW_HOST_KEY, False) or user_input[CONF_HOST] != self.config.get(CONF_HOST):
+                self.config.pop(CONF_SSH_HOST_KEY, None)
+            for key in _drop_default_intervals(user_input):
+                self.config.pop(key, None)
             self.config.update(user_input)
             self.hass.config_entries.async_update_entry(
                 self.config_entry,
@@ -113,6 +267,14 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             data_schema=vol.Schema(
                     {
                         vol.Required(CONF_HOST, default=self.config.get(CONF_HOST)): cv.string,
+                        vol.Required(CONF_TRANSPORT, default=self.config.get(CONF_TRANSPORT, TRANSPORT_HTTP)): selector.SelectSelector(
+                            selector.SelectSelectorConfig(
+                                options=TRANSPORTS, translation_key=CONF_TRANSPORT
+                            ),
+                        ),
+                        vol.Optional(CONF_UBUS_SOCKET, default=self.config.get(CONF_UBUS_SOCKET, DEFAULT_UBUS_SOCKET)): cv.string,
+                        vol.Optional(CONF_SSH_PORT, default=self.config.get(CONF_SSH_PORT, DEFAULT_SSH_PORT)): cv.port,
+                        vol.Required(CONF_SSH_TRUST_NEW_HOST_KEY, default=False): cv.boolean,
                         vol.Required(CONF_USERNAME, default=self.config.get(CONF_USERNAME)): cv.string,
                         vol.Optional(CONF_PASSWORD, default=self.config.get(CONF_PASSWORD)): cv.string,
                         vol.Required(CONF_SSL, default=self.config.get(CONF_SSL)): cv.boolean,
@@ -128,11 +290,81 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                             ),
                             vol.Coerce(int)
                         ),
+                        vol.Optional(CONF_DEVICES_COUNT_INTERVAL, description={"suggested_value": self.config.get(CONF_DEVICES_COUNT_INTERVAL)}): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Optional(CONF_BANDWIDTH_INTERVAL, description={"suggested_value": self.config.get(CONF_BANDWIDTH_INTERVAL)}): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Optional(CONF_BANDWIDTH_DEADBAND, default=self.config.get(CONF_BANDWIDTH_DEADBAND, 0)): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=0,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="B/s",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Required(CONF_ADAPTIVE_POLLING, default=self.config.get(CONF_ADAPTIVE_POLLING, False)): cv.boolean,
+                        vol.Required(CONF_TOPOLOGY_TTL, default=self.config.get(CONF_TOPOLOGY_TTL, DEFAULT_TOPOLOGY_TTL)): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=30,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Required(CONF_CONNECT_TIMEOUT, default=self.config.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT)): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    max=120,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
+                        vol.Required(CONF_READ_TIMEOUT, default=self.config.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT)): vol.All(
+                            selector.NumberSelector(
+                                selector.NumberSelectorConfig(
+                                    min=1,
+                                    max=120,
+                                    step=1,
+                                    mode=selector.NumberSelectorMode.BOX,
+                                    unit_of_measurement="seconds",
+                                ),
+                            ),
+                            vol.Coerce(int)
+                        ),
                         vol.Optional(CONF_SENSORS, default=self.config.get(CONF_SENSORS)): selector.SelectSelector(
                             selector.SelectSelectorConfig(
                                 options=SENSORS, translation_key=CONF_SENSORS, multiple=True
                             ),
                         ),
+                        vol.Required(CONF_CLIENT_EVENTS, default=self.config.get(CONF_CLIENT_EVENTS, False)): cv.boolean,
                         vol.Required(CONF_BANDWIDTH_DEVICES, default=self.config.get(CONF_BANDWIDTH_DEVICES)): cv.string,
                         vol.Required(CONF_BUTTONS, default=self.config.get(CONF_BUTTONS, [])): selector.SelectSelector(
                             selector.SelectSelectorConfig(
@@ -141,4 +373,5 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                         ),
                     }
             ),
+            errors=errors,
         )
@@ -1,28 +1,77 @@
 from typing import Final
 
 DOMAIN: Final = "ha_openwrt"
+DATA_FLEET: Final = f"{DOMAIN}_fleet"
 
 CONF_BUTTONS = "buttons"
 CONF_BUTTON_REBOOT = "reboot"
 CONF_SENSOR_DEVICES_COUNT = "devices_count"
 CONF_SENSOR_BANDWIDTH = "bandwidth"
+CONF_SENSOR_BANDWIDTH_STATISTICS = "bandwidth_statistics"
+CONF_SENSOR_CLIENTS = "clients"
+CONF_SENSOR_SYSTEM = "system"
+CONF_SENSOR_WIRELESS = "wireless"
+CONF_SENSOR_TRAFFIC_HISTORY = "traffic_history"
 CONF_BANDWIDTH_DEVICES = "bandwidth_devices"
+CONF_TOPOLOGY_TTL = "topology_ttl"
+CONF_CLIENT_EVENTS = "client_events"
+CONF_DEVICES_COUNT_INTERVAL = "devices_count_interval"
+CONF_BANDWIDTH_INTERVAL = "bandwidth_interval"
+CONF_BANDWIDTH_DEADBAND = "bandwidth_deadband"
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_TRANSPORT = "transport"
+CONF_UBUS_SOCKET = "ubus_socket"
+CONF_SSH_PORT = "ssh_port"
+CONF_SSH_HOST_KEY = "ssh_host_key"
+CONF_SSH_TRUST_NEW_HOST_KEY = "ssh_trust_new_host_key"
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+CONF_READ_TIMEOUT = "read_timeout"
+
+TRANSPORT_HTTP = "http"
+TRANSPORT_LOCAL = "local"
+TRANSPORT_SSH = "ssh"
+
+DEFAULT_TOPOLOGY_TTL = 600
+DEFAULT_UBUS_SOCKET = "/var/run/ubus/ubus.sock"
+DEFAULT_SSH_PORT = 22
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 10
 
 DATA_DEVICES_COUNT = "devices_count"
 DATA_BANDWIDTH = "bandwidth"
+DATA_BANDWIDTH_STATISTICS = "bandwidth_statistics"
+DATA_SYSTEM = "system"
+DATA_WIRELESS = "wireless"
+DATA_LEASES = "leases"
+DATA_BANDWIDTH_TOTAL = "bandwidth_total"
+DATA_TRAFFIC_HISTORY = "traffic_history"
+
+DOWNLOAD = "download"
+UPLOAD = "upload"
+
+SIGNAL_CLIENT_NEW = DOMAIN + "_client_new_{}"
+SIGNAL_CLIENT_TRACKER_UPDATE = DOMAIN + "_client_tracker_update_{}_{}"
+SIGNAL_CLIENT_THROUGHPUT_UPDATE = DOMAIN + "_client_throughput_update_{}_{}_{}"
 
 
 API_DEF_SESSION_ID = "00000000000000000000000000000000"
 API_ERROR = "error"
 API_GET = "get"
 API_MESSAGE = "message"
+API_METHOD_ASSOCLIST = "assoclist"
 API_METHOD_BOARD = "board"
 API_METHOD_GET = "get"
 API_METHOD_GET_CLIENTS = "get_clients"
+API_METHOD_GET_DHCP_LEASES = "getDHCPLeases"
+API_METHOD_GET_NETWORK_DEVICES = "getNetworkDevices"
+API_METHOD_GET_REALTIME_STATS = "getRealtimeStats"
 API_METHOD_INFO = "info"
 API_METHOD_LOGIN = "login"
 API_METHOD_READ = "read"
 API_METHOD_REBOOT = "reboot"
+API_METHOD_SNAPSHOT = "snapshot"
+API_METHOD_STATUS = "status"
+API_METHOD_SURVEY = "survey"
 API_PARAM_CONFIG = "config"
 API_PARAM_PASSWORD = "password"
 API_PARAM_PATH = "path"
@@ -36,10 +85,16 @@ API_RPC_VERSION = "2.0"
 API_SUBSYS_DHCP = "dhcp"
 API_SUBSYS_FILE = "file"
 API_SUBSYS_HOSTAPD = "hostapd.*"
+# object of the companion rpcd plugin shipped in rpcd/ha-openwrt
+API_SUBSYS_HA_OPENWRT = "ha-openwrt"
+API_SUBSYS_IWINFO = "iwinfo"
 API_SUBSYS_SESSION = "session"
 API_SUBSYS_SYSTEM = "system"
 API_SUBSYS_UCI = "uci"
 API_SUBSYS_LUCI = "luci"
+API_SUBSYS_LUCI_RPC = "luci-rpc"
+API_SUBSYS_NETWORK_DEVICE = "network.device"
+API_SUBSYS_NETWORK_WIRELESS = "network.wireless"
 API_UBUS_RPC_SESSION = "ubus_rpc_session"
 
 HTTP_STATUS_OK = 200
\ No newline at end of file
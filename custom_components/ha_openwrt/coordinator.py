@@ -1,12 +1,9 @@
-import asyncio
-from http import HTTPStatus
-import json
 import logging
-from datetime import timedelta, datetime
-from urllib.parse import urljoin
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import time
+from datetime import timedelta
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.const import (
     CONF_NAME,
     CONF_HOST,
@@ -18,180 +15,101 @@ from homeassistant.const import (
     CONF_SCAN_INTERVAL
 )
 from .const import (
-    API_DEF_SESSION_ID,
-    API_ERROR,
-    API_MESSAGE,
-    API_METHOD_BOARD,
-    API_METHOD_INFO,
-    API_METHOD_LOGIN,
-    API_METHOD_REBOOT,
-    API_PARAM_PASSWORD,
-    API_PARAM_USERNAME,
-    API_RESULT,
-    API_RPC_CALL,
-    API_RPC_ID,
-    API_RPC_VERSION,
-    API_SUBSYS_LUCI,
-    API_SUBSYS_SESSION,
-    API_SUBSYS_SYSTEM,
-    API_UBUS_RPC_SESSION,
+    API_SUBSYS_HA_OPENWRT,
+    API_SUBSYS_NETWORK_WIRELESS,
+    CONF_ADAPTIVE_POLLING,
+    CONF_BANDWIDTH_DEADBAND,
     CONF_BANDWIDTH_DEVICES,
+    CONF_BANDWIDTH_INTERVAL,
+    CONF_CLIENT_EVENTS,
+    CONF_CONNECT_TIMEOUT,
+    CONF_DEVICES_COUNT_INTERVAL,
+    CONF_READ_TIMEOUT,
     CONF_SENSOR_BANDWIDTH,
+    CONF_SENSOR_BANDWIDTH_STATISTICS,
+    CONF_SENSOR_CLIENTS,
     CONF_SENSOR_DEVICES_COUNT,
+    CONF_SENSOR_SYSTEM,
+    CONF_SENSOR_TRAFFIC_HISTORY,
+    CONF_SENSOR_WIRELESS,
+    CONF_TOPOLOGY_TTL,
+    CONF_SSH_HOST_KEY,
+    CONF_SSH_PORT,
+    CONF_TRANSPORT,
+    CONF_UBUS_SOCKET,
     DATA_BANDWIDTH,
+    DATA_BANDWIDTH_STATISTICS,
+    DATA_BANDWIDTH_TOTAL,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_SSH_PORT,
+    DEFAULT_TOPOLOGY_TTL,
+    DEFAULT_UBUS_SOCKET,
     DOMAIN,
-    DATA_DEVICES_COUNT
+    DATA_DEVICES_COUNT,
+    DATA_LEASES,
+    DATA_SYSTEM,
+    DATA_TRAFFIC_HISTORY,
+    DATA_WIRELESS,
+    DOWNLOAD,
+    TRANSPORT_LOCAL,
+    TRANSPORT_SSH,
+    UPLOAD
 )
+from .bandwidth import BandwidthMeter, RateStatistics, rates_from_history
+from .history import TrafficHistory, async_import_hours
+from .clients import RECONCILE_INTERVAL, ClientRegistry, HostapdEventListener
+from .leases import DHCP_LEASE_FILE, parse_lease_file, parse_luci_leases
+from .router import STORAGE_KEY_METADATA, STORAGE_VERSION, UbusRouter
+from .system import CONNTRACK_COUNT, PROC_STAT, SystemMonitor, first_line
+from .ubus_cli import LocalUbusRouter, SshUbusRouter
+from .wireless import RadioMonitor
 
 _LOGGER = logging.getLogger(__name__)
 
 UPDATE_INTERVAL = timedelta(seconds=5)
-
-
-class OpenwrtRouter:
-    def __init__(self, hass):
-        self.hass = hass
-
-    def is_logged_in(self):
-        raise NotImplementedError
-
-    async def async_connect(self):
-        raise NotImplementedError
-
-    async def async_get_devices_count(self):
-        raise NotImplementedError
-
-    async def async_reboot(self):
-        raise NotImplementedError
-
-
-class UbusRouter(OpenwrtRouter):
-    def __init__(self, hass, unique_id, name, host, username, password, ssl, verify_ssl=False):
-        super().__init__(hass)
-        self.unique_id = unique_id
-        self.name = name
-        self.url = f"{'https' if ssl else 'http'}://{host}/ubus"
-        self.host = host
-        self.ssl = ssl
-        self.username = username
-        self.password = password
-        self.session = async_get_clientsession(hass, verify_ssl=verify_ssl)
-        self.timeout = 5
-        self.rpc_id = API_RPC_ID
-        self.session_id = None
-        self.wireless_devices = []
-        self.device_info = None
-
-    async def asnyc_api_call(self, rpc_method, subsystem=None, method=None, params: dict = None):
-        """Perform API call."""
-        if self.session_id is None:
-            await self.async_connect()
-
-        _params = [self.session_id, subsystem]
-        if rpc_method == API_RPC_CALL:
-            if method:
-                _params.append(method)
-
-            if params:
-                _params.append(params)
+# adaptive polling backs off to at most this many times the configured interval
+ADAPTIVE_MAX_FACTOR = 8
+# a bandwidth change larger than this share of the previous rate, and at least
+# ADAPTIVE_BANDWIDTH_FLOOR bytes/s, brings polling back to the configured interval
+ADAPTIVE_BANDWIDTH_THRESHOLD = 0.2
+ADAPTIVE_BANDWIDTH_FLOOR = 10240
+# hostnames and addresses change rarely, the leases are read at most this often
+LEASES_INTERVAL = 60
+# luci-rpc lease reads failing in a row before the lease file is read instead,
+# luci-rpc is tried again this often while it is
+LEASES_MAX_FAILURES = 3
+LEASES_RECHECK_INTERVAL = 3600
+# luci-bwc keeps a few minutes of samples, reading them this often leaves no gaps
+TRAFFIC_HISTORY_INTERVAL = 60
+# tolerance for the fleet scheduler firing slightly ahead of a due time
+SCHEDULE_SLACK = 0.5
+
+class PollSchedule:
+    """Polling interval of one kind of data.
+
+    In adaptive mode the interval doubles after every poll that brought no change,
+    up to ADAPTIVE_MAX_FACTOR times the configured one, and drops back on a change.
+    """
+
+    __slots__ = ("base", "interval", "adaptive", "due")
+
+    def __init__(self, interval, adaptive=False):
+        self.base = interval
+        self.interval = interval
+        self.adaptive = adaptive
+        self.due = 0
+
+    def is_due(self, now):
+        return now >= self.due - SCHEDULE_SLACK
+
+    def polled(self, now, changed):
+        if self.adaptive:
+            if changed:
+                self.interval = self.base
             else:
-                _params.append({})
-
-        data = json.dumps(
-            {
-                "jsonrpc": API_RPC_VERSION,
-                "id": self.rpc_id,
-                "method": rpc_method,
-                "params": _params,
-            }
-        )
-
-        self.rpc_id += 1
-        async with asyncio.timeout(self.timeout):
-            response = await self.session.post(
-                self.url, data=data
-            )
-
-        if response.status != HTTPStatus.OK:
-            return None
-
-        json_response = await response.json()
-
-        if API_ERROR in json_response:
-            if (
-                API_MESSAGE in json_response[API_ERROR]
-                and json_response[API_ERROR][API_MESSAGE] == "Access denied"
-            ):
-                self.session_id = None
-                raise PermissionError(json_response[API_ERROR][API_MESSAGE])
-            raise ConnectionError(json_response[API_ERROR][API_MESSAGE])
-
-        if rpc_method == API_RPC_CALL:
-            try:
-                return json_response[API_RESULT][1]
-            except IndexError:
-                return None
-        else:
-            return json_response[API_RESULT]
-
-        return None
-
-    async def async_connect(self):
-        """Connect to OpenWrt ubus API."""
-        self.rpc_id = 1
-        self.session_id = API_DEF_SESSION_ID
-
-        login = await self.asnyc_api_call(
-            API_RPC_CALL,
-            API_SUBSYS_SESSION,
-            API_METHOD_LOGIN,
-            {
-                API_PARAM_USERNAME: self.username,
-                API_PARAM_PASSWORD: self.password,
-            },
-        )
-        if API_UBUS_RPC_SESSION in login:
-            self.session_id = login[API_UBUS_RPC_SESSION]
-        else:
-            self.session_id = None
-
-        return self.session_id
-
-    def is_logged_in(self):
-        return self.session_id is not None
-
-    async def async_get_devices_count(self):
-        if not self.wireless_devices:
-            if (result := await self.asnyc_api_call(API_RPC_CALL, "luci-rpc", "getNetworkDevices")) is None:
-                return None
-            self.wireless_devices = [device["name"]
-                                     for device in result.values() if device["wireless"]]
-
-        results = 0
-        for device in self.wireless_devices:
-            if result := await self.asnyc_api_call(API_RPC_CALL, "iwinfo", "assoclist", {"device": device}):
-                results = results + len(result["results"])
-
-        return results
-
-    async def async_reboot(self):
-        await self.asnyc_api_call(API_RPC_CALL, API_SUBSYS_SYSTEM, API_METHOD_REBOOT)
-    
-    async def async_get_bandwidth(self, device):
-        return await self.asnyc_api_call(API_RPC_CALL, API_SUBSYS_LUCI, "getRealtimeStats", {"mode": "interface", "device": device})
-    
-    async def async_get_device_info(self):
-        if self.device_info is None:
-            board_info = await self.asnyc_api_call(API_RPC_CALL, API_SUBSYS_SYSTEM, API_METHOD_BOARD)
-            self.device_info = DeviceInfo(
-                identifiers={(DOMAIN, self.unique_id)},
-                name=self.name,
-                configuration_url=f"{'https' if self.ssl else 'http'}://{self.host}",
-                model=board_info["model"],
-                sw_version=f"{board_info['release']['description']}(kernel:{board_info['kernel']})"
-            )
-    
-        return self.device_info
+                self.interval = min(self.interval * 2, self.base * ADAPTIVE_MAX_FACTOR)
+        self.due = now + self.interval
 
 
 class OpenwrtDataUpdateCoordinator(DataUpdateCoordinator):
@@ -200,34 +118,425 @@ class OpenwrtDataUpdateCoordinator(DataUpdateCoordinator):
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(seconds=config[CONF_SCAN_INTERVAL])
-        )
-        self.router = UbusRouter(
-            hass,
-            self.config_entry.entry_id,
-            config[CONF_NAME],
-            config[CONF_HOST],
-            config[CONF_USERNAME],
-            config.get(CONF_PASSWORD, ""),
-            config[CONF_SSL],
-            config[CONF_VERIFY_SSL],
+            # refreshes are driven by the fleet scheduler
+            update_interval=None,
+            # a refresh that changed nothing does not notify the entities
+            always_update=False
         )
+        self.scan_interval = config[CONF_SCAN_INTERVAL]
+        if config.get(CONF_TRANSPORT) == TRANSPORT_LOCAL:
+            self.router = LocalUbusRouter(
+                hass,
+                self.config_entry.entry_id,
+                config[CONF_NAME],
+                config[CONF_HOST],
+                config.get(CONF_UBUS_SOCKET) or DEFAULT_UBUS_SOCKET,
+                config.get(CONF_TOPOLOGY_TTL, DEFAULT_TOPOLOGY_TTL),
+                config.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT),
+                config.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT),
+            )
+        elif config.get(CONF_TRANSPORT) == TRANSPORT_SSH:
+            self.router = SshUbusRouter(
+                hass,
+                self.config_entry.entry_id,
+                config[CONF_NAME],
+                config[CONF_HOST],
+                config[CONF_USERNAME],
+                config.get(CONF_PASSWORD, ""),
+                config.get(CONF_SSH_PORT) or DEFAULT_SSH_PORT,
+                config.get(CONF_TOPOLOGY_TTL, DEFAULT_TOPOLOGY_TTL),
+                config.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT),
+                config.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                host_key=config.get(CONF_SSH_HOST_KEY),
+            )
+            self.router.host_key_callback = self._async_pin_host_key
+        else:
+            self.router = UbusRouter(
+                hass,
+                self.config_entry.entry_id,
+                config[CONF_NAME],
+                config[CONF_HOST],
+                config[CONF_USERNAME],
+                config.get(CONF_PASSWORD, ""),
+                config[CONF_SSL],
+                config[CONF_VERIFY_SSL],
+                config.get(CONF_TOPOLOGY_TTL, DEFAULT_TOPOLOGY_TTL),
+                config.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT),
+                config.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT),
+            )
+        self.router.unreachable_callback = self._async_router_unreachable
         self.sensors = config[CONF_SENSORS]
+        adaptive = config.get(CONF_ADAPTIVE_POLLING, False)
+        self.poll_clients = CONF_SENSOR_DEVICES_COUNT in self.sensors or CONF_SENSOR_CLIENTS in self.sensors
+        self.schedules = {}
+        if self.poll_clients:
+            self.schedules[DATA_DEVICES_COUNT] = PollSchedule(
+                config.get(CONF_DEVICES_COUNT_INTERVAL) or self.scan_interval, adaptive)
+        if (CONF_SENSOR_BANDWIDTH in self.sensors or CONF_SENSOR_BANDWIDTH_STATISTICS in self.sensors
+                or CONF_SENSOR_TRAFFIC_HISTORY in self.sensors):
+            self.schedules[DATA_BANDWIDTH] = PollSchedule(
+                config.get(CONF_BANDWIDTH_INTERVAL) or self.scan_interval, adaptive)
+        self.metadata_store = Store(hass, STORAGE_VERSION, STORAGE_KEY_METADATA.format(self.config_entry.entry_id))
+        self._saved_metadata = None
+        self.system_monitor = None
+        if CONF_SENSOR_SYSTEM in self.sensors:
+            self.schedules[DATA_SYSTEM] = PollSchedule(self.scan_interval, adaptive)
+            self.system_monitor = SystemMonitor()
+        self.radio_monitor = None
+        if CONF_SENSOR_WIRELESS in self.sensors:
+            self.schedules[DATA_WIRELESS] = PollSchedule(self.scan_interval, adaptive)
+            self.radio_monitor = RadioMonitor()
+        # the radio list is discovered for client counts and radio sensors alike
+        self.poll_radios = self.poll_clients or self.radio_monitor is not None
         self.bandwidth_devices = [ device.strip() for device in config.get(CONF_BANDWIDTH_DEVICES,"").split(",") if device ]
+        self.bandwidth_meter = BandwidthMeter()
+        self.bandwidth_deadband = config.get(CONF_BANDWIDTH_DEADBAND) or 0
+        # devices without counters in network.device status, read from the realtime history
+        self.bandwidth_history_devices = set()
+        self.bandwidth_statistics = {}
+        if CONF_SENSOR_BANDWIDTH_STATISTICS in self.sensors:
+            self.bandwidth_statistics = {
+                (device, direction): RateStatistics()
+                for device in self.bandwidth_devices
+                for direction in (DOWNLOAD, UPLOAD)
+            }
+        self.bandwidth_totals = {}
+        self.traffic_history = {}
+        if CONF_SENSOR_TRAFFIC_HISTORY in self.sensors:
+            self.traffic_history = {device: TrafficHistory() for device in self.bandwidth_devices}
+            self.schedules[DATA_TRAFFIC_HISTORY] = PollSchedule(max(TRAFFIC_HISTORY_INTERVAL, self.scan_interval))
+        self.hostapd_listener = None
+        self.clients_reconciled = 0
+        if config.get(CONF_CLIENT_EVENTS, False) and CONF_SENSOR_DEVICES_COUNT in self.sensors:
+            self.hostapd_listener = HostapdEventListener(self.router, self._async_clients_changed)
+        self.client_registry = None
+        if CONF_SENSOR_CLIENTS in self.sensors:
+            self.client_registry = ClientRegistry(hass, self.config_entry.entry_id)
+            self.schedules[DATA_LEASES] = PollSchedule(max(LEASES_INTERVAL, self.scan_interval), adaptive)
+        # dnsmasq lease file instead of luci-rpc
+        self.leases_from_file = False
+        self._leases_failures = 0
+        self._leases_file_since = 0
+
+    @property
+    def poll_interval(self):
+        """Return how often the fleet scheduler should refresh this router."""
+        return min((schedule.interval for schedule in self.schedules.values()), default=self.scan_interval)
+
+    @staticmethod
+    def _bandwidth_changed(previous, current):
+        for device, rates in current.items():
+            if rates is None or (previous_rates := (previous or {}).get(device)) is None:
+                continue
+            for direction, rate in rates.items():
+                if rate is None or (previous_rate := previous_rates.get(direction)) is None:
+                    continue
+                if abs(rate - previous_rate) > max(previous_rate * ADAPTIVE_BANDWIDTH_THRESHOLD,
+                                                   ADAPTIVE_BANDWIDTH_FLOOR):
+                    return True
+        return False
+
+    @callback
+    def _async_pin_host_key(self, host_key):
+        """Keep the SSH host key of the first connection in the entry."""
+        self.hass.config_entries.async_update_entry(
+            self.config_entry, data={**self.config_entry.data, CONF_SSH_HOST_KEY: host_key}
+        )
 
-    async def _async_update_data(self):
-        if self.router.device_info is None:
-            await self.router.async_get_device_info()
-
-        data = {}
+    @callback
+    def _async_router_unreachable(self, err):
+        """Mark the entities unavailable as soon as the circuit opens, even outside a refresh."""
+        self.async_set_update_error(UpdateFailed(f"{self.router.host} is unreachable: {err!r}"))
+
+    @callback
+    def _async_clients_changed(self):
+        if self.data is None:
+            return
+        self.data = {**self.data, DATA_DEVICES_COUNT: self.hostapd_listener.count}
+        self.async_update_listeners()
+
+    def _poll_assoclist(self):
+        return (
+            self.hostapd_listener is None
+            or self.client_registry is not None
+            or not self.hostapd_listener.active
+            or time.monotonic() - self.clients_reconciled > RECONCILE_INTERVAL
+        )
 
-        if CONF_SENSOR_DEVICES_COUNT in self.sensors:
-            data[DATA_DEVICES_COUNT] = await self.router.async_get_devices_count()
+    def _metadata(self):
+        return {
+            **self.router.metadata(),
+            "bandwidth_history_devices": sorted(self.bandwidth_history_devices),
+        }
+
+    async def async_load_metadata(self):
+        """Restore board info, radios and interfaces discovered by a previous run.
+
+        Returns True if there is enough to create the entities before the first refresh.
+        """
+        if (metadata := await self.metadata_store.async_load()) is None:
+            return False
+
+        self.router.restore_metadata(metadata)
+        self.bandwidth_history_devices = set(metadata.get("bandwidth_history_devices", [])) & set(self.bandwidth_devices)
+        self._saved_metadata = metadata
+        return self.router.device_info is not None
+
+    @callback
+    def _async_save_metadata(self):
+        if (metadata := self._metadata()) != self._saved_metadata:
+            self._saved_metadata = metadata
+            self.metadata_store.async_delay_save(lambda: metadata, 0)
+
+    async def async_close(self):
+        if self.hostapd_listener is not None:
+            await self.hostapd_listener.async_stop()
+        await self.router.async_close()
+
+    def _use_snapshot(self):
+        """The rpcd plugin snapshot stands in for the assoclist, counter and system calls.
+
+        It only has client counts, so not while clients are tracked by MAC.
+        """
+        return self.router.snapshot_supported and self.client_registry is None and self.hostapd_listener is None
+
+    def _refresh_calls(self, due, snapshot):
+        calls = {}
+
+        if snapshot:
+            calls[API_SUBSYS_HA_OPENWRT] = self.router.snapshot_call()
+
+        if DATA_DEVICES_COUNT in due and not snapshot:
+            calls[API_SUBSYS_NETWORK_WIRELESS] = self.router.wireless_status_call()
+            if self._poll_assoclist():
+                for device in self.router.wireless_devices or []:
+                    calls[(DATA_DEVICES_COUNT, device)] = self.router.assoclist_call(device)
+
+        if DATA_LEASES in due:
+            calls[DATA_LEASES] = self._leases_call()
+
+        if DATA_WIRELESS in due:
+            if not snapshot:
+                calls[API_SUBSYS_NETWORK_WIRELESS] = self.router.wireless_status_call()
+            # info and survey of every radio go out in the same batch
+            for device in self.router.wireless_devices or []:
+                calls[(DATA_WIRELESS, "info", device)] = self.router.iwinfo_info_call(device)
+                calls[(DATA_WIRELESS, "survey", device)] = self.router.survey_call(device)
+
+        if DATA_SYSTEM in due and not snapshot:
+            calls[(DATA_SYSTEM, "info")] = self.router.system_info_call()
+            calls[(DATA_SYSTEM, "stat")] = self.router.file_read_call(PROC_STAT)
+            calls[(DATA_SYSTEM, "conntrack")] = self.router.file_read_call(CONNTRACK_COUNT)
+
+        if DATA_BANDWIDTH in due:
+            if not snapshot:
+                calls[DATA_BANDWIDTH] = self.router.device_status_call()
+            for device in self.bandwidth_history_devices:
+                calls[(DATA_BANDWIDTH, device)] = self.router.bandwidth_call(device)
+
+        if DATA_TRAFFIC_HISTORY in due:
+            # the same sample window as the bandwidth of history devices, read once
+            for device in self.traffic_history:
+                if (DATA_BANDWIDTH, device) not in calls:
+                    calls[(DATA_TRAFFIC_HISTORY, device)] = self.router.bandwidth_call(device)
+
+        return calls
 
-        if CONF_SENSOR_BANDWIDTH in self.sensors:
-            data[DATA_BANDWIDTH] = {}
+    async def _async_update_data(self):
+        try:
+            return await self._async_poll()
+        except ConnectionError as err:
+            # includes RouterUnreachable while the circuit breaker is open
+            raise UpdateFailed(str(err)) from err
+
+    async def _async_poll(self):
+        await self.router.async_discover(wireless=self.poll_radios)
+
+        now = time.monotonic()
+        due = {kind for kind, schedule in self.schedules.items() if schedule.is_due(now)}
+
+        # everything below goes out as a single batch request
+        snapshot = bool(due) and self._use_snapshot()
+        calls = self._refresh_calls(due, snapshot)
+        results = await self.router.async_api_batch(calls)
+
+        if snapshot and results[API_SUBSYS_HA_OPENWRT] is None:
+            _LOGGER.debug("%s: rpcd plugin snapshot failed, falling back to single calls", self.router.host)
+            self.router.snapshot_failed()
+            snapshot = False
+            calls = self._refresh_calls(due, snapshot)
+            results = await self.router.async_api_batch(calls)
+
+        if snapshot:
+            results[DATA_BANDWIDTH] = self.router.apply_snapshot(results[API_SUBSYS_HA_OPENWRT])
+        assoclist_keys = [key for key in calls if isinstance(key, tuple) and key[0] == DATA_DEVICES_COUNT]
+
+        # kinds that are not due keep their previous values
+        data = dict(self.data or {})
+
+        if API_SUBSYS_NETWORK_WIRELESS in calls:
+            self.router.async_check_topology(results[API_SUBSYS_NETWORK_WIRELESS])
+
+        # before the assoclists, so new clients start out with their hostname
+        if DATA_LEASES in due:
+            self.schedules[DATA_LEASES].polled(now, await self._async_update_leases(results))
+
+        if DATA_DEVICES_COUNT in due:
+            if self.client_registry is not None and assoclist_keys:
+                self.client_registry.async_update({key[1]: results[key] for key in assoclist_keys}, now)
+            if self.router.wireless_devices is None:
+                devices_count = None
+            elif snapshot:
+                devices_count = sum(results[API_SUBSYS_HA_OPENWRT].get("clients", {}).values())
+            elif self.hostapd_listener is None:
+                devices_count = self.router.parse_devices_count(
+                    results[key] for key in assoclist_keys
+                )
+            else:
+                if assoclist_keys:
+                    self.hostapd_listener.async_reconcile({
+                        key[1]: self.router.parse_assoclist(results[key]) for key in assoclist_keys
+                    })
+                    self.clients_reconciled = time.monotonic()
+                self.hostapd_listener.async_set_interfaces(self.router.wireless_devices)
+                devices_count = self.hostapd_listener.count
+
+            self.schedules[DATA_DEVICES_COUNT].polled(now, devices_count != data.get(DATA_DEVICES_COUNT))
+            data[DATA_DEVICES_COUNT] = devices_count
+
+        if DATA_SYSTEM in due:
+            if snapshot:
+                system = self.system_monitor.update(
+                    results[API_SUBSYS_HA_OPENWRT].get("info"),
+                    results[API_SUBSYS_HA_OPENWRT].get("cpu"),
+                    results[API_SUBSYS_HA_OPENWRT].get("conntrack"),
+                )
+            else:
+                system = self.system_monitor.update(
+                    results[(DATA_SYSTEM, "info")],
+                    first_line(results[(DATA_SYSTEM, "stat")]),
+                    first_line(results[(DATA_SYSTEM, "conntrack")]),
+                )
+            self.schedules[DATA_SYSTEM].polled(now, system != data.get(DATA_SYSTEM))
+            data[DATA_SYSTEM] = system
+
+        if DATA_WIRELESS in due:
+            wireless = {
+                device: self.radio_monitor.update(
+                    device,
+                    results.get((DATA_WIRELESS, "info", device)),
+                    results.get((DATA_WIRELESS, "survey", device)),
+                )
+                for device in self.router.wireless_devices or []
+            }
+            self.schedules[DATA_WIRELESS].polled(now, wireless != data.get(DATA_WIRELESS))
+            data[DATA_WIRELESS] = wireless
+
+        if DATA_BANDWIDTH in due:
+            bandwidth = await self._async_update_bandwidth(results)
+            self.schedules[DATA_BANDWIDTH].polled(now, self._bandwidth_changed(data.get(DATA_BANDWIDTH), bandwidth))
+            data[DATA_BANDWIDTH] = bandwidth
+            if self.bandwidth_statistics:
+                data[DATA_BANDWIDTH_STATISTICS] = self._update_bandwidth_statistics(time.monotonic(), bandwidth)
+            if self.traffic_history:
+                data[DATA_BANDWIDTH_TOTAL] = dict(self.bandwidth_totals)
+
+        if DATA_TRAFFIC_HISTORY in due:
+            self._update_traffic_history(results)
+            self.schedules[DATA_TRAFFIC_HISTORY].polled(now, True)
+
+        self._async_save_metadata()
+        return data
 
-            for device in self.bandwidth_devices:
-                data[DATA_BANDWIDTH][device] = await self.router.async_get_bandwidth(device)
+    def _leases_call(self):
+        if self.leases_from_file:
+            return self.router.file_read_call(DHCP_LEASE_FILE)
+        return self.router.dhcp_leases_call()
+
+    async def _async_update_leases(self, results):
+        """Apply one read of all DHCP leases to the client registry, return whether any changed."""
+        result = results[DATA_LEASES]
+        from_file = self.leases_from_file
+        if from_file:
+            if time.monotonic() - self._leases_file_since >= LEASES_RECHECK_INTERVAL:
+                # luci-rpc may have been installed since, one failed read goes back to the file
+                self.leases_from_file = False
+                self._leases_failures = LEASES_MAX_FAILURES - 1
+        elif result is not None:
+            self._leases_failures = 0
+        else:
+            # a failed batch yields None as well, so a single miss keeps luci-rpc
+            self._leases_failures += 1
+            if self._leases_failures < LEASES_MAX_FAILURES:
+                return False
+            _LOGGER.debug("%s: no luci-rpc DHCP leases, reading %s", self.router.host, DHCP_LEASE_FILE)
+            self.leases_from_file = from_file = True
+            self._leases_file_since = time.monotonic()
+            result = (await self.router.async_api_batch({DATA_LEASES: self._leases_call()}))[DATA_LEASES]
+
+        if result is None:
+            return False
+        if from_file:
+            return self.client_registry.async_update_leases(parse_lease_file(result.get("data")))
+        return self.client_registry.async_update_leases(parse_luci_leases(result))
+
+    def _update_traffic_history(self, results):
+        importing = "recorder" in self.hass.config.components
+        for device, history in self.traffic_history.items():
+            stats = results.get((DATA_TRAFFIC_HISTORY, device)) or results.get((DATA_BANDWIDTH, device))
+            if stats is None:
+                continue
+            history.add_rows(stats["result"])
+            if (hours := history.pop_hours()) and importing:
+                async_import_hours(self.hass, self.config_entry.entry_id, self.router.name, device, hours)
+
+    def _update_bandwidth_statistics(self, timestamp, bandwidth):
+        statistics = {}
+        for device in self.bandwidth_devices:
+            rates = bandwidth.get(device) or {}
+            statistics[device] = {}
+            for direction in (DOWNLOAD, UPLOAD):
+                self.bandwidth_statistics[(device, direction)].add(timestamp, rates.get(direction))
+                statistics[device][direction] = self.bandwidth_statistics[(device, direction)].snapshot()
+        return statistics
+
+    async def _async_update_bandwidth(self, results):
+        timestamp = time.monotonic()
+        statuses = results[DATA_BANDWIDTH]
+        bandwidth = {}
+        history_calls = {}
+
+        for device in self.bandwidth_devices:
+            if device in self.bandwidth_history_devices:
+                continue
+
+            if statuses is None:
+                history_calls[(DATA_BANDWIDTH, device)] = self.router.bandwidth_call(device)
+                continue
+
+            if (statistics := statuses.get(device, {}).get("statistics")) is None:
+                _LOGGER.debug("%s: no counters for %s, using realtime stats", self.router.host, device)
+                self.bandwidth_history_devices.add(device)
+                history_calls[(DATA_BANDWIDTH, device)] = self.router.bandwidth_call(device)
+                continue
+
+            bandwidth[device] = self.bandwidth_meter.update(
+                device, statistics["rx_bytes"], statistics["tx_bytes"], timestamp
+            ) or dict.fromkeys((DOWNLOAD, UPLOAD))
+            self.bandwidth_totals[device] = {DOWNLOAD: statistics["rx_bytes"], UPLOAD: statistics["tx_bytes"]}
+
+        if history_calls:
+            results.update(await self.router.async_api_batch(history_calls))
+
+        for device in self.bandwidth_devices:
+            if device in bandwidth:
+                continue
+
+            if (stats := results.get((DATA_BANDWIDTH, device))) is None:
+                bandwidth[device] = None
+            else:
+                bandwidth[device] = rates_from_history(stats["result"]) or dict.fromkeys((DOWNLOAD, UPLOAD))
+                if stats["result"]:
+                    self.bandwidth_totals[device] = {DOWNLOAD: stats["result"][-1][1], UPLOAD: stats["result"][-1][3]}
 
-        return data
+        return bandwidth
@@ -0,0 +1,106 @@
+"""Support for tracking wireless clients of an OpenWrt router."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.components.device_tracker import ScannerEntity, SourceType
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_SENSORS, Platform
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import (
+    CONF_SENSOR_CLIENTS,
+    DOMAIN,
+    SIGNAL_CLIENT_NEW,
+    SIGNAL_CLIENT_TRACKER_UPDATE
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    if CONF_SENSOR_CLIENTS not in entry.data[CONF_SENSORS]:
+        return
+
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    registry = coordinator.client_registry
+    prefix = f"ha-openwrt-{entry.entry_id}-client-"
+
+    # clients seen in earlier runs come back as not connected until they show up again
+    macs = set(registry.clients)
+    for entity in er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id):
+        if entity.domain == Platform.DEVICE_TRACKER and entity.unique_id.startswith(prefix):
+            macs.add(entity.unique_id.removeprefix(prefix))
+
+    # a restored or forgotten client that connects again is announced as new by the registry
+    added = set()
+
+    @callback
+    def async_add_clients(macs):
+        new = [mac for mac in macs if mac not in added]
+        added.update(new)
+        async_add_entities([ClientTracker(registry, mac) for mac in new])
+
+    async_add_clients(macs)
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_CLIENT_NEW.format(entry.entry_id), async_add_clients)
+    )
+
+
+class ClientTracker(ScannerEntity):
+
+    _attr_should_poll = False
+
+    def __init__(self, registry, mac: str) -> None:
+        self._registry = registry
+        self._mac = mac
+        self._attr_unique_id = f"ha-openwrt-{registry.entry_id}-client-{mac}"
+        self._attr_name = mac
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_CLIENT_TRACKER_UPDATE.format(self._registry.entry_id, self._mac),
+                self.async_write_ha_state,
+            )
+        )
+
+    @property
+    def source_type(self) -> SourceType:
+        return SourceType.ROUTER
+
+    @property
+    def mac_address(self) -> str:
+        return self._mac
+
+    @property
+    def hostname(self) -> str | None:
+        client = self._registry.clients.get(self._mac)
+        return None if client is None else client.hostname
+
+    @property
+    def ip_address(self) -> str | None:
+        client = self._registry.clients.get(self._mac)
+        return None if client is None else client.ip
+
+    @property
+    def is_connected(self) -> bool:
+        client = self._registry.clients.get(self._mac)
+        return client is not None and client.connected
+
+    @property
+    def extra_state_attributes(self):
+        if (client := self._registry.clients.get(self._mac)) is None:
+            return None
+        return {
+            "interface": client.interface,
+            "signal": client.signal,
+        }
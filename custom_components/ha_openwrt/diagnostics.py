@@ -0,0 +1,36 @@
+"""Diagnostics support for Openwrt."""
+from __future__ import annotations
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_FLEET, DOMAIN
+
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    router = coordinator.router
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "router": {
+            "batch_supported": router.batch_supported,
+            "wireless_devices": router.wireless_devices,
+            "bandwidth_history_devices": sorted(coordinator.bandwidth_history_devices),
+            "leases_from_file": coordinator.leases_from_file,
+            "poll_intervals": {kind: schedule.interval for kind, schedule in coordinator.schedules.items()},
+            "last_update_success": coordinator.last_update_success,
+        },
+        # 5 minute (mean, min, max) buckets of the hour not imported yet
+        "traffic_history": {
+            device: {f"{start} {direction}": values for (start, direction), values in history.buckets().items()}
+            for device, history in coordinator.traffic_history.items()
+        },
+        "breaker": router.breaker.as_dict(),
+        "metrics": router.metrics.as_dict(),
+        "fleet": hass.data[DATA_FLEET].stats if DATA_FLEET in hass.data else None,
+    }
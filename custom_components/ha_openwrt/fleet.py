@@ -0,0 +1,136 @@
+"""Shared refresh scheduler for all configured routers."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from functools import partial
+import logging
+import math
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# ubus requests in flight across all routers
+MAX_FLEET_REQUESTS = 16
+MAX_BACKOFF = 300
+STATS_WINDOW = 60
+# golden ratio spreads the phases of any number of routers evenly over an interval
+PHASE_STEP = 0.618
+
+
+class _Member:
+    __slots__ = ("coordinator", "due", "failures", "unsub", "task")
+
+    def __init__(self, coordinator, due: float) -> None:
+        self.coordinator = coordinator
+        self.due = due
+        self.failures = 0
+        self.unsub = None
+        self.task = None
+
+
+class FleetScheduler:
+    """Drive the refreshes of every router coordinator from one place.
+
+    Refreshes are staggered so routers sharing an interval do not fire together,
+    all routers share one cap on requests in flight, and a router that fails or
+    takes longer than its interval is backed off exponentially so it cannot
+    hold up the others.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.requests = asyncio.Semaphore(MAX_FLEET_REQUESTS)
+        self._members: dict[str, _Member] = {}
+        self._refreshed = deque()
+        self._lag = deque()
+        self._stats_logged = time.monotonic()
+
+    @callback
+    def async_add(self, coordinator) -> None:
+        coordinator.router.fleet_requests = self.requests
+        interval = coordinator.poll_interval
+        phase = (len(self._members) * PHASE_STEP) % 1 * interval
+        member = _Member(coordinator, time.monotonic() + interval + phase)
+        self._members[coordinator.config_entry.entry_id] = member
+        self._schedule(member)
+
+    @callback
+    def async_remove(self, coordinator) -> None:
+        if (member := self._members.pop(coordinator.config_entry.entry_id, None)) is None:
+            return
+        if member.unsub is not None:
+            member.unsub()
+        if member.task is not None:
+            member.task.cancel()
+        coordinator.router.fleet_requests = None
+
+    @callback
+    def _schedule(self, member: _Member) -> None:
+        delay = max(member.due - time.monotonic(), 0)
+        member.unsub = async_call_later(self.hass, delay, partial(self._start, member))
+
+    @callback
+    def _start(self, member: _Member, _now) -> None:
+        member.unsub = None
+        member.task = self.hass.async_create_background_task(
+            self._async_refresh(member), f"{DOMAIN} {member.coordinator.router.host} refresh"
+        )
+
+    async def _async_refresh(self, member: _Member) -> None:
+        coordinator = member.coordinator
+        start = time.monotonic()
+        self._lag.append((start, start - member.due))
+
+        await coordinator.async_refresh()
+
+        now = time.monotonic()
+        self._refreshed.append(now)
+        interval = coordinator.poll_interval
+        if coordinator.last_update_success and now - start < interval:
+            member.failures = 0
+            # keep the phase, skip whole intervals that were missed
+            member.due += interval * max(1, math.ceil((now - member.due) / interval))
+        elif coordinator.router.breaker.is_open:
+            # the router backs off its liveness probe on its own, refresh when the next one is due
+            member.failures += 1
+            member.due = now + max(coordinator.router.breaker.probe_in, interval)
+        else:
+            member.failures += 1
+            backoff = min(interval * 2 ** member.failures, MAX_BACKOFF)
+            _LOGGER.debug("%s: refresh %s after %.3fs, backing off for %ss",
+                          coordinator.router.host,
+                          "succeeded" if coordinator.last_update_success else "failed",
+                          now - start, backoff)
+            member.due = now + backoff
+
+        member.task = None
+        if self._members.get(coordinator.config_entry.entry_id) is member:
+            self._schedule(member)
+
+        if now - self._stats_logged > STATS_WINDOW:
+            self._stats_logged = now
+            _LOGGER.debug("Fleet stats: %s", self.stats)
+
+    @property
+    def stats(self) -> dict:
+        """Return refresh rate and schedule lag over the last STATS_WINDOW seconds."""
+        since = time.monotonic() - STATS_WINDOW
+        while self._refreshed and self._refreshed[0] < since:
+            self._refreshed.popleft()
+        while self._lag and self._lag[0][0] < since:
+            self._lag.popleft()
+
+        lags = [lag for _, lag in self._lag]
+        return {
+            "routers": len(self._members),
+            "backing_off": sum(1 for member in self._members.values() if member.failures),
+            "refreshes_per_second": len(self._refreshed) / STATS_WINDOW,
+            "lag_average": sum(lags) / len(lags) if lags else 0,
+            "lag_max": max(lags, default=0),
+        }
@@ -0,0 +1,136 @@
+"""Long-term traffic statistics built from the realtime stats sample window."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.const import UnitOfDataRate
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import slugify
+
+from .bandwidth import counter_delta
+from .const import DOMAIN, DOWNLOAD, UPLOAD
+
+BUCKET_SECONDS = 300
+HOUR_SECONDS = 3600
+
+
+class _Bucket:
+    """Mean, min and max of the per-second rates that fell into one period."""
+
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, rate: float, count: int = 1) -> None:
+        self.count += count
+        self.total += rate * count
+        self.min = rate if self.min is None else min(self.min, rate)
+        self.max = rate if self.max is None else max(self.max, rate)
+
+    def merge(self, other: _Bucket) -> None:
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+
+class TrafficHistory:
+    """Aggregate the realtime stats rows of one interface into 5 minute and hourly buckets.
+
+    Every read returns the whole sample window of luci-bwc, rows already seen are
+    skipped by their timestamp, so reads only need to come often enough that the
+    window still overlaps the previous one. Hours are handed out once a row of
+    the next hour has been seen. Rows of the first read that belong to an earlier
+    hour than its newest row are dropped, that hour is only partly covered.
+    """
+
+    def __init__(self) -> None:
+        self._last = None
+        # (start of 5 minute bucket, direction) -> _Bucket
+        self._buckets: dict[tuple[int, str], _Bucket] = {}
+
+    def add_rows(self, rows: list) -> None:
+        """Add `[timestamp, rx bytes, rx packets, tx bytes, tx packets]` rows."""
+        if self._last is None and rows:
+            # the first window after a start can reach back into an hour imported
+            # by the previous run, importing it again would replace it with a few rows
+            current_hour = rows[-1][0] - rows[-1][0] % HOUR_SECONDS
+            rows = [row for row in rows if row[0] >= current_hour]
+        for row in rows:
+            timestamp, rx_bytes, tx_bytes = row[0], row[1], row[3]
+            last, self._last = self._last, (timestamp, rx_bytes, tx_bytes)
+            if last is None:
+                continue
+            elapsed = timestamp - last[0]
+            if elapsed <= 0:
+                # seen before, keep the newest row
+                self._last = last
+                continue
+            start = timestamp - timestamp % BUCKET_SECONDS
+            for direction, previous, current in (
+                (DOWNLOAD, last[1], rx_bytes),
+                (UPLOAD, last[2], tx_bytes),
+            ):
+                if (delta := counter_delta(previous, current)) is None:
+                    continue
+                # a gap between reads counts as one sample per second it covers
+                self._buckets.setdefault((start, direction), _Bucket()).add(delta / elapsed, elapsed)
+
+    def buckets(self) -> dict:
+        """Return the 5 minute buckets not handed out yet as (mean, min, max)."""
+        return {
+            key: (bucket.mean, bucket.min, bucket.max)
+            for key, bucket in sorted(self._buckets.items())
+        }
+
+    def pop_hours(self) -> dict[str, list[StatisticData]]:
+        """Remove the completed hours and return their statistics by direction."""
+        if self._last is None:
+            return {}
+        current_hour = self._last[0] - self._last[0] % HOUR_SECONDS
+
+        hours: dict[tuple[int, str], _Bucket] = {}
+        for key in [key for key in self._buckets if key[0] < current_hour]:
+            start, direction = key
+            hours.setdefault((start - start % HOUR_SECONDS, direction), _Bucket()).merge(self._buckets.pop(key))
+
+        statistics = {}
+        for (start, direction), bucket in sorted(hours.items()):
+            statistics.setdefault(direction, []).append(StatisticData(
+                start=datetime.fromtimestamp(start, timezone.utc),
+                mean=bucket.mean,
+                min=bucket.min,
+                max=bucket.max,
+            ))
+        return statistics
+
+
+def statistic_id(entry_id: str, device: str, direction: str) -> str:
+    return f"{DOMAIN}:{slugify(f'{entry_id}_{device}_{direction}')}"
+
+
+@callback
+def async_import_hours(hass: HomeAssistant, entry_id: str, name: str, device: str, hours: dict) -> None:
+    """Hand the hourly statistics of an interface to the recorder in one import per direction."""
+    for direction, statistics in hours.items():
+        metadata = StatisticMetaData(
+            has_mean=True,
+            has_sum=False,
+            name=f"{name} {device} {'Upload' if direction == UPLOAD else 'Download'}",
+            source=DOMAIN,
+            statistic_id=statistic_id(entry_id, device, direction),
+            unit_of_measurement=UnitOfDataRate.BYTES_PER_SECOND,
+        )
+        async_add_external_statistics(hass, metadata, statistics)
@@ -0,0 +1,72 @@
+"""Hostnames and addresses of clients from the DHCP leases of the router."""
+from __future__ import annotations
+
+# dnsmasq lease file, read when luci-rpc is not installed
+DHCP_LEASE_FILE = "/tmp/dhcp.leases"
+
+
+class Lease:
+    __slots__ = ("hostname", "ip", "ip6")
+
+    def __init__(self, hostname=None, ip=None, ip6=None) -> None:
+        self.hostname = hostname
+        self.ip = ip
+        self.ip6 = ip6
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Lease) and (
+            (self.hostname, self.ip, self.ip6) == (other.hostname, other.ip, other.ip6)
+        )
+
+
+def _hostname(name):
+    # dnsmasq writes * for clients that sent no name
+    return None if not name or name == "*" else name
+
+
+def parse_luci_leases(result) -> dict[str, Lease]:
+    """Index a luci-rpc getDHCPLeases reply by MAC."""
+    leases = {}
+    for lease in result.get("dhcp_leases") or []:
+        if (mac := lease.get("macaddr")) is None:
+            continue
+        leases[mac.lower()] = Lease(_hostname(lease.get("hostname")), lease.get("ipaddr"))
+    # DHCPv6 leases only carry a MAC when luci could match the DUID to one
+    for lease in result.get("dhcp6_leases") or []:
+        if (mac := lease.get("macaddr")) is None:
+            continue
+        entry = leases.setdefault(mac.lower(), Lease(_hostname(lease.get("hostname"))))
+        entry.ip6 = lease.get("ip6addr") or next(iter(lease.get("ip6addrs") or []), None)
+    return leases
+
+
+def parse_lease_file(text) -> dict[str, Lease]:
+    """Index the lines of a dnsmasq lease file, `<expiry> <mac> <ip> <hostname> <client id>`."""
+    leases = {}
+    for line in (text or "").splitlines():
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        leases[fields[1].lower()] = Lease(_hostname(fields[3]), fields[2])
+    return leases
+
+
+class LeaseIndex:
+    """DHCP leases keyed by MAC, updated in place from each fresh read."""
+
+    def __init__(self) -> None:
+        self.leases: dict[str, Lease] = {}
+
+    def get(self, mac: str) -> Lease | None:
+        return self.leases.get(mac)
+
+    def update(self, leases: dict[str, Lease]) -> set[str]:
+        """Apply a full read of the leases, return the MACs whose lease changed."""
+        changed = set(self.leases) - set(leases)
+        for mac in changed:
+            del self.leases[mac]
+        for mac, lease in leases.items():
+            if self.leases.get(mac) != lease:
+                self.leases[mac] = lease
+                changed.add(mac)
+        return changed
@@ -0,0 +1,100 @@
+"""Counters and latency histograms of the ubus calls made to a router."""
+from __future__ import annotations
+
+from bisect import bisect_left
+import math
+
+# upper bounds in seconds, the last bucket takes everything slower
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, math.inf)
+
+# pseudo method under which whole batch requests are recorded
+BATCH = ("batch", "")
+
+
+class MethodStats:
+    """Statistics of one (subsystem, method) pair."""
+
+    __slots__ = (
+        "calls", "errors", "timeouts", "request_bytes", "response_bytes",
+        "latency_total", "latency_max", "histogram",
+    )
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "latency_average": self.latency_total / self.calls if self.calls else None,
+            "latency_max": self.latency_max,
+            "latency_histogram": dict(zip(map(str, LATENCY_BUCKETS), self.histogram)),
+        }
+
+
+class UbusMetrics:
+    """Per-method call statistics of one router plus session level counters."""
+
+    def __init__(self) -> None:
+        self.methods: dict[tuple[str, str], MethodStats] = {}
+        self.auth_retries = 0
+
+    def record(self, subsystem: str, method: str, latency: float, request_bytes: int = 0,
+               response_bytes: int = 0, error: bool = False, timeout: bool = False) -> None:
+        if (stats := self.methods.get((subsystem, method))) is None:
+            stats = self.methods[(subsystem, method)] = MethodStats()
+
+        stats.calls += 1
+        stats.errors += error or timeout
+        stats.timeouts += timeout
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+        stats.latency_total += latency
+        stats.latency_max = max(stats.latency_max, latency)
+        stats.histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def _total(self, attribute: str) -> int:
+        return sum(
+            getattr(stats, attribute) for key, stats in self.methods.items() if key != BATCH
+        )
+
+    @property
+    def calls(self) -> int:
+        return self._total("calls")
+
+    @property
+    def errors(self) -> int:
+        return self._total("errors")
+
+    @property
+    def timeouts(self) -> int:
+        return self._total("timeouts")
+
+    @property
+    def slowest(self) -> tuple[str, float] | None:
+        """Return the method with the highest average latency."""
+        averages = [
+            (f"{subsystem}.{method}", stats.latency_total / stats.calls)
+            for (subsystem, method), stats in self.methods.items()
+            if stats.calls and (subsystem, method) != BATCH
+        ]
+        return max(averages, key=lambda item: item[1], default=None)
+
+    def as_dict(self) -> dict:
+        return {
+            "auth_retries": self.auth_retries,
+            "methods": {
+                f"{subsystem}.{method}" if method else subsystem: stats.as_dict()
+                for (subsystem, method), stats in self.methods.items()
+            },
+        }
@@ -0,0 +1,978 @@
+"""ubus JSON-RPC client of an OpenWrt router."""
+import asyncio
+import aiohttp
+import contextlib
+from functools import partial
+from http import HTTPStatus
+import logging
+import time
+from urllib.parse import urlsplit
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.util.ssl import get_default_context, get_default_no_verify_context
+from .const import (
+    API_DEF_SESSION_ID,
+    API_ERROR,
+    API_MESSAGE,
+    API_METHOD_ASSOCLIST,
+    API_METHOD_BOARD,
+    API_METHOD_GET_DHCP_LEASES,
+    API_METHOD_GET_NETWORK_DEVICES,
+    API_METHOD_GET_REALTIME_STATS,
+    API_METHOD_INFO,
+    API_METHOD_LOGIN,
+    API_METHOD_READ,
+    API_METHOD_REBOOT,
+    API_METHOD_SNAPSHOT,
+    API_METHOD_STATUS,
+    API_METHOD_SURVEY,
+    API_PARAM_PASSWORD,
+    API_PARAM_PATH,
+    API_PARAM_USERNAME,
+    API_RESULT,
+    API_RPC_CALL,
+    API_RPC_ID,
+    API_RPC_LIST,
+    API_RPC_VERSION,
+    API_SUBSYS_FILE,
+    API_SUBSYS_HA_OPENWRT,
+    API_SUBSYS_IWINFO,
+    API_SUBSYS_LUCI,
+    API_SUBSYS_LUCI_RPC,
+    API_SUBSYS_NETWORK_DEVICE,
+    API_SUBSYS_NETWORK_WIRELESS,
+    API_SUBSYS_SESSION,
+    API_SUBSYS_SYSTEM,
+    API_UBUS_RPC_SESSION,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_TOPOLOGY_TTL,
+    DOMAIN
+)
+from . import codec
+from .breaker import CircuitBreaker, RouterUnreachable, async_tcp_probe
+from .metrics import BATCH, UbusMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_CALLS_IN_FLIGHT = 4
+# calls in flight with room for logins and requests of other callers, the long
+# lived event streams hold connections of a pool of their own
+MAX_CONNECTIONS_PER_HOST = 8
+# below the 20s uhttpd closes idle connections after, so a pooled connection
+# is never reused just as the router drops it
+KEEPALIVE_TIMEOUT = 15
+
+STORAGE_VERSION = 1
+STORAGE_KEY_SESSION = DOMAIN + ".{}.session"
+STORAGE_KEY_METADATA = DOMAIN + ".{}.metadata"
+SESSION_DEFAULT_TIMEOUT = 300
+# log in again this many seconds before the session would expire
+SESSION_RENEW_MARGIN = 30
+SESSION_SAVE_DELAY = 60
+
+# calls that change router state, never shared between callers or cached
+WRITE_METHODS = {(API_SUBSYS_SYSTEM, API_METHOD_REBOOT)}
+# seconds the replies of these read-only calls are served from memory
+CACHED_METHODS = {(API_SUBSYS_SYSTEM, API_METHOD_BOARD): 300}
+
+# check again this often whether the rpcd plugin was installed
+PLUGIN_RECHECK_INTERVAL = 3600
+# snapshots failing in a row before the plugin is taken as broken
+SNAPSHOT_MAX_FAILURES = 3
+
+
+class UbusError(ConnectionError):
+    """Raised for an error reply of ubus, the router itself answered."""
+
+
+class SubscriptionsUnsupported(Exception):
+    """Raised when uhttpd has no event subscription endpoint."""
+
+
+def _select_network_devices(result):
+    return {
+        name: {"name": device.get("name", name), "wireless": device.get("wireless", False)}
+        for name, device in result.items()
+    }
+
+
+def _select_device_status(result):
+    return {
+        name: {"statistics": {
+            "rx_bytes": status["statistics"].get("rx_bytes"),
+            "tx_bytes": status["statistics"].get("tx_bytes"),
+        }} if "statistics" in status else {}
+        for name, status in result.items()
+    }
+
+
+def _select_assoclist(result):
+    return {
+        "results": [
+            {
+                "mac": station["mac"],
+                "signal": station.get("signal"),
+                "rx": {"bytes": station.get("rx", {}).get("bytes")},
+                "tx": {"bytes": station.get("tx", {}).get("bytes")},
+            }
+            for station in result.get("results", [])
+        ]
+    }
+
+
+def _select_dhcp_leases(result):
+    return {
+        "dhcp_leases": [
+            {key: lease.get(key) for key in ("macaddr", "hostname", "ipaddr")}
+            for lease in result.get("dhcp_leases", [])
+        ],
+        "dhcp6_leases": [
+            {key: lease.get(key) for key in ("macaddr", "hostname", "ip6addr", "ip6addrs")}
+            for lease in result.get("dhcp6_leases", []) if lease.get("macaddr")
+        ],
+    }
+
+
+def _select_iwinfo_info(result):
+    return {key: result.get(key) for key in ("channel", "frequency", "txpower", "noise", "bitrate")}
+
+
+def _select_survey(result):
+    return {
+        "results": [
+            {key: entry.get(key) for key in ("mhz", "noise", "active_time", "busy_time")}
+            for entry in result.get("results", [])
+        ]
+    }
+
+
+# only the fields read by the integration are kept of these replies, so large
+# device maps and station lists are not held on to between refreshes
+RESULT_SELECTORS = {
+    (API_SUBSYS_LUCI_RPC, API_METHOD_GET_NETWORK_DEVICES): _select_network_devices,
+    (API_SUBSYS_LUCI_RPC, API_METHOD_GET_DHCP_LEASES): _select_dhcp_leases,
+    (API_SUBSYS_NETWORK_DEVICE, API_METHOD_STATUS): _select_device_status,
+    (API_SUBSYS_IWINFO, API_METHOD_ASSOCLIST): _select_assoclist,
+    (API_SUBSYS_IWINFO, API_METHOD_INFO): _select_iwinfo_info,
+    (API_SUBSYS_IWINFO, API_METHOD_SURVEY): _select_survey,
+}
+
+
+class OpenwrtRouter:
+    def __init__(self, hass):
+        self.hass = hass
+
+    def is_logged_in(self):
+        raise NotImplementedError
+
+    async def async_connect(self):
+        raise NotImplementedError
+
+    async def async_get_devices_count(self):
+        raise NotImplementedError
+
+    async def async_reboot(self):
+        raise NotImplementedError
+
+    async def async_close(self):
+        pass
+
+
+class UbusRouter(OpenwrtRouter):
+    def __init__(self, hass, unique_id, name, host, username, password, ssl, verify_ssl=False,
+                 topology_ttl=DEFAULT_TOPOLOGY_TTL, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT):
+        super().__init__(hass)
+        self.unique_id = unique_id
+        self.name = name
+        self.url = f"{'https' if ssl else 'http'}://{host}/ubus"
+        self.host = host
+        self.ssl = ssl
+        self.username = username
+        self.password = password
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # budget of a whole request, from connecting to the last byte of the body
+        self.timeout = connect_timeout + read_timeout
+        self._ssl_context = (get_default_context() if verify_ssl else get_default_no_verify_context()) if ssl else False
+        self.session = self._create_session()
+        # one connection per event stream for as long as it is open, created on first use
+        self._event_session = None
+        self.rpc_id = API_RPC_ID
+        self.session_id = None
+        self.session_timeout = SESSION_DEFAULT_TIMEOUT
+        self.session_expires = 0
+        self.session_store = Store(hass, STORAGE_VERSION, STORAGE_KEY_SESSION.format(unique_id))
+        self._unsub_session_renewal = None
+        self._closed = False
+        self._login_lock = asyncio.Lock()
+        # identical read calls in flight, and replies of CACHED_METHODS with their expiry
+        self._in_flight = {}
+        self._cache = {}
+        self.batch_supported = True
+        self.metrics = UbusMetrics()
+        self.breaker = CircuitBreaker()
+        self._probe_lock = asyncio.Lock()
+        # called with the error when the circuit opens
+        self.unreachable_callback = None
+        # pluggable JSON codec and per-method result selectors
+        self.json_dumps = codec.dumps
+        self.json_loads = codec.loads
+        self.result_selectors = dict(RESULT_SELECTORS)
+        self.calls_in_flight = asyncio.Semaphore(MAX_CALLS_IN_FLIGHT)
+        # shared with the other routers by the fleet scheduler
+        self.fleet_requests = None
+        self.wireless_devices = None
+        self.topology_ttl = topology_ttl
+        self.topology_updated = 0
+        self.topology_signature = None
+        self._topology_refresh = None
+        self.board_info = None
+        self.device_info = None
+        # whether the companion rpcd plugin is installed, None until checked
+        self.snapshot_supported = None
+        self._snapshot_checked = 0.0
+        self._snapshot_failures = 0
+
+    def _create_session(self):
+        # a connection pool of its own keeps connections, and their TLS handshake,
+        # alive between polls instead of sharing the limits of the Home Assistant pool
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                ssl=self._ssl_context,
+                limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=self.timeout, connect=self.connect_timeout, sock_read=self.read_timeout
+            ),
+        )
+
+    def _build_request(self, rpc_method, subsystem=None, method=None, params: dict = None):
+        if subsystem == API_SUBSYS_SESSION and method == API_METHOD_LOGIN:
+            _params = [API_DEF_SESSION_ID, subsystem]
+        else:
+            _params = [self.session_id, subsystem]
+        if rpc_method == API_RPC_CALL:
+            if method:
+                _params.append(method)
+
+            if params:
+                _params.append(params)
+            else:
+                _params.append({})
+
+        request = {
+            "jsonrpc": API_RPC_VERSION,
+            "id": self.rpc_id,
+            "method": rpc_method,
+            "params": _params,
+        }
+
+        self.rpc_id += 1
+        return request
+
+    def _select(self, subsystem, method, result):
+        if result is None or (select := self.result_selectors.get((subsystem, method))) is None:
+            return result
+        return select(result)
+
+    def _parse_response(self, rpc_method, json_response):
+        if API_ERROR in json_response:
+            if (
+                API_MESSAGE in json_response[API_ERROR]
+                and json_response[API_ERROR][API_MESSAGE] == "Access denied"
+            ):
+                self.session_id = None
+                raise PermissionError(json_response[API_ERROR][API_MESSAGE])
+            raise UbusError(json_response[API_ERROR][API_MESSAGE])
+
+        if rpc_method == API_RPC_CALL:
+            try:
+                return json_response[API_RESULT][1]
+            except IndexError:
+                return None
+        else:
+            return json_response[API_RESULT]
+
+    async def _async_relogin_once(self, func, *args):
+        """Run an API request, log in again and retry once if the session was rejected."""
+        try:
+            return await func(*args)
+        except PermissionError:
+            _LOGGER.debug("%s: session rejected, logging in again", self.host)
+            self.metrics.auth_retries += 1
+            await self.async_connect()
+            return await func(*args)
+
+    def _flight_key(self, subsystem=None, method=None, params: dict = None):
+        """Return the key identical read calls share, None for calls that must run on their own."""
+        if subsystem == API_SUBSYS_SESSION or (subsystem, method) in WRITE_METHODS:
+            return None
+        return (subsystem, method, self.json_dumps(params or {}))
+
+    def _cached(self, key):
+        if (entry := self._cache.get(key)) is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def _store(self, key, result):
+        if result is not None and (ttl := CACHED_METHODS.get(key[:2])) is not None:
+            self._cache[key] = (time.monotonic() + ttl, result)
+
+    async def _async_single_flight(self, key, func, *args):
+        """Run func(*args) once for all callers asking for the same key at the same time."""
+        if (result := self._cached(key)) is not None:
+            return result
+        if (task := self._in_flight.get(key)) is None:
+            task = self._in_flight[key] = self.hass.async_create_task(
+                func(*args), f"{DOMAIN} {self.host} {key[0]}.{key[1]}"
+            )
+            task.add_done_callback(partial(self._flight_done, key))
+        # one caller giving up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _flight_done(self, key, task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result())
+
+    async def _async_probe(self) -> bool:
+        """Return whether the router answers at all, without making a ubus call."""
+        url = urlsplit(self.url)
+        return await async_tcp_probe(url.hostname, url.port or (443 if self.ssl else 80), self.connect_timeout)
+
+    async def _async_check_breaker(self):
+        """Raise RouterUnreachable while the circuit is open and the router does not answer a probe."""
+        if not self.breaker.is_open:
+            return
+        async with self._probe_lock:
+            if not self.breaker.is_open:
+                return
+            if not self.breaker.probe_due():
+                raise RouterUnreachable(f"{self.host}: unreachable, next check in {self.breaker.probe_in:.0f}s")
+            if not await self._async_probe():
+                self.breaker.probe_failed()
+                raise RouterUnreachable(f"{self.host}: unreachable, next check in {self.breaker.probe_in:.0f}s")
+            _LOGGER.debug("%s: probe answered, trying requests again", self.host)
+
+    async def _async_guarded(self, func, *args):
+        """Run a request through the circuit breaker.
+
+        Only for requests that go out to the router, its reply is what closes the circuit.
+        """
+        await self._async_check_breaker()
+        try:
+            result = await func(*args)
+        except UbusError:
+            # an ACL denial or a missing object is still a reply
+            if self.breaker.success():
+                _LOGGER.info("%s: reachable again", self.host)
+            raise
+        except (ConnectionError, TimeoutError, aiohttp.ClientError) as err:
+            if self.breaker.failure():
+                _LOGGER.warning("%s: unreachable after %d failed requests, checking again in %.0fs",
+                                self.host, self.breaker.failures, self.breaker.probe_in)
+                if self.unreachable_callback is not None:
+                    self.unreachable_callback(err)
+            raise
+        if self.breaker.success():
+            _LOGGER.info("%s: reachable again", self.host)
+        return result
+
+    async def asnyc_api_call(self, rpc_method, subsystem=None, method=None, params: dict = None):
+        """Perform API call."""
+        if subsystem == API_SUBSYS_SESSION:
+            return await self._async_api_call(rpc_method, subsystem, method, params)
+        if (key := self._flight_key(subsystem, method, params)) is None:
+            return await self._async_guarded(
+                self._async_relogin_once, self._async_api_call, rpc_method, subsystem, method, params
+            )
+        if (result := self._cached(key)) is not None:
+            return result
+        return await self._async_guarded(
+            self._async_single_flight,
+            key, self._async_relogin_once, self._async_api_call, rpc_method, subsystem, method, params
+        )
+
+    async def _async_api_call(self, rpc_method, subsystem=None, method=None, params: dict = None):
+        if self.session_id is None and subsystem != API_SUBSYS_SESSION:
+            await self.async_connect()
+
+        data = self.json_dumps(self._build_request(rpc_method, subsystem, method, params))
+
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout), self.session.post(self.url, data=data) as response:
+                if response.status != HTTPStatus.OK:
+                    self.metrics.record(subsystem, method, time.monotonic() - start, len(data), error=True)
+                    return None
+
+                body = await response.read()
+        except TimeoutError:
+            self.metrics.record(subsystem, method, time.monotonic() - start, len(data), timeout=True)
+            raise
+        except aiohttp.ClientError:
+            self.metrics.record(subsystem, method, time.monotonic() - start, len(data), error=True)
+            raise
+        latency = time.monotonic() - start
+
+        json_response = await codec.async_loads(self.hass, body, self.json_loads)
+
+        try:
+            result = self._select(subsystem, method, self._parse_response(rpc_method, json_response))
+        except (ConnectionError, PermissionError):
+            self.metrics.record(subsystem, method, latency, len(data), len(body), error=True)
+            raise
+        self.metrics.record(subsystem, method, latency, len(data), len(body))
+        self._touch_session()
+        return result
+
+    async def async_subscribe(self, path):
+        """Yield (event, data) tuples from the uhttpd event stream of a ubus object.
+
+        A first (None, None) tuple is yielded as soon as the stream is open.
+        """
+        await self._async_check_breaker()
+        if self.session_id is None:
+            await self.async_connect()
+
+        if self._event_session is None:
+            if self._closed:
+                raise ConnectionError(f"{self.host}: closed")
+            # unlimited, there is one stream per wireless interface
+            self._event_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=self._ssl_context, limit=0))
+
+        async with self._event_session.get(
+            f"{self.url}/subscribe/{path}",
+            headers={"Authorization": f"Bearer {self.session_id}"},
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout),
+        ) as response:
+            if response.status == HTTPStatus.NOT_FOUND:
+                raise SubscriptionsUnsupported(f"{self.url}/subscribe")
+            if response.status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+                self.session_id = None
+                raise PermissionError(response.reason)
+            if response.status != HTTPStatus.OK:
+                raise ConnectionError(response.reason)
+
+            yield None, None
+
+            event = None
+            data = []
+            async for line in response.content:
+                line = line.decode().rstrip("\r\n")
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and (event or data):
+                    yield event, self.json_loads("\n".join(data)) if data else None
+                    event = None
+                    data = []
+
+    def _fleet_slot(self):
+        return self.fleet_requests or contextlib.nullcontext()
+
+    async def _async_limited_call(self, rpc_method, subsystem=None, method=None, params: dict = None):
+        async with self.calls_in_flight, self._fleet_slot():
+            start = time.monotonic()
+            try:
+                return await self._async_api_call(rpc_method, subsystem, method, params)
+            finally:
+                _LOGGER.debug("%s: %s.%s took %.3fs", self.host, subsystem,
+                              method, time.monotonic() - start)
+
+    def _async_shared_call(self, rpc_method, subsystem=None, method=None, params: dict = None):
+        if (key := self._flight_key(subsystem, method, params)) is None:
+            return self._async_limited_call(rpc_method, subsystem, method, params)
+        return self._async_single_flight(key, self._async_limited_call, rpc_method, subsystem, method, params)
+
+    async def async_api_gather(self, calls: dict):
+        """Perform several API calls concurrently, at most MAX_CALLS_IN_FLIGHT at a time.
+
+        Takes and returns the same mappings as `async_api_batch`. A call that times out
+        or fails yields None, the results of the other calls are kept. Raises
+        ConnectionError when no call reached the router.
+        """
+        if not calls:
+            return {}
+        return await self._async_guarded(self._async_relogin_once, self._async_api_gather, calls)
+
+    async def _async_api_gather(self, calls: dict):
+        if not calls:
+            return {}
+
+        if self.session_id is None:
+            await self.async_connect()
+
+        start = time.monotonic()
+        results = await asyncio.gather(
+            *(self._async_shared_call(*call) for call in calls.values()),
+            return_exceptions=True
+        )
+        _LOGGER.debug("%s: gathered %d calls in %.3fs", self.host, len(calls), time.monotonic() - start)
+
+        errors = {}
+        for key, call, result in zip(calls, calls.values(), results):
+            if not isinstance(result, BaseException):
+                continue
+            if isinstance(result, PermissionError) or not isinstance(
+                result, (ConnectionError, TimeoutError, aiohttp.ClientError)
+            ):
+                raise result
+            _LOGGER.debug("%s: %s.%s failed: %r", self.host, call[1], call[2], result)
+            errors[key] = result
+
+        # an error reply of ubus still means the router was reached
+        unreachable = [err for err in errors.values() if isinstance(err, (TimeoutError, aiohttp.ClientError))]
+        if len(unreachable) == len(calls):
+            # let the circuit breaker see a refresh in which nothing got through
+            raise ConnectionError(f"none of {len(calls)} calls got through") from unreachable[0]
+
+        return {key: None if key in errors else result for key, result in zip(calls, results)}
+
+    async def async_api_batch(self, calls: dict):
+        """Perform several API calls in a single JSON-RPC batch request.
+
+        `calls` maps a key chosen by the caller to a (rpc_method, subsystem, method, params)
+        tuple, the result of every call is returned under the same key. A call that fails
+        on its own yields None instead of failing the whole batch. Calls with a cached
+        reply are answered from the cache and left out of the request.
+        """
+        flight_keys = {key: self._flight_key(*call[1:]) for key, call in calls.items()}
+        cached = {}
+        for key, flight_key in flight_keys.items():
+            if flight_key is not None and (result := self._cached(flight_key)) is not None:
+                cached[key] = result
+        if len(cached) == len(calls):
+            # nothing goes out, so nothing to tell the circuit breaker either
+            return cached
+
+        results = await self._async_guarded(
+            self._async_relogin_once,
+            self._async_api_batch, {key: call for key, call in calls.items() if key not in cached}
+        )
+        for key, result in results.items():
+            if flight_keys[key] is not None:
+                self._store(flight_keys[key], result)
+        return {**cached, **results}
+
+    async def _async_api_batch(self, calls: dict):
+        if not calls:
+            return {}
+
+        if not self.batch_supported:
+            return await self._async_api_gather(calls)
+
+        if self.session_id is None:
+            await self.async_connect()
+
+        requests = {key: self._build_request(*call) for key, call in calls.items()}
+        request_data = {key: self.json_dumps(request) for key, request in requests.items()}
+        data = b"[" + b",".join(request_data.values()) + b"]"
+
+        start = time.monotonic()
+        try:
+            async with (
+                self.calls_in_flight,
+                self._fleet_slot(),
+                asyncio.timeout(self.timeout),
+                self.session.post(self.url, data=data) as response,
+            ):
+                body = await response.read()
+        except TimeoutError:
+            self.metrics.record(*BATCH, time.monotonic() - start, len(data), timeout=True)
+            for call in calls.values():
+                self.metrics.record(call[1], call[2], time.monotonic() - start, timeout=True)
+            raise
+        except aiohttp.ClientError:
+            self.metrics.record(*BATCH, time.monotonic() - start, len(data), error=True)
+            raise
+        latency = time.monotonic() - start
+        _LOGGER.debug("%s: batch of %d calls took %.3fs", self.host, len(calls), latency)
+        self.metrics.record(*BATCH, latency, len(data), len(body), error=response.status != HTTPStatus.OK)
+
+        if response.status == HTTPStatus.BAD_REQUEST:
+            json_response = None
+        elif response.status != HTTPStatus.OK:
+            return dict.fromkeys(calls)
+        else:
+            json_response = await codec.async_loads(self.hass, body, self.json_loads)
+
+        if not isinstance(json_response, list):
+            # rpcd without batch support answers with a single error object
+            _LOGGER.debug("%s: batch requests rejected, falling back to single calls", self.host)
+            self.batch_supported = False
+            return await self._async_api_batch(calls)
+
+        responses = {
+            item.get("id"): item for item in json_response if isinstance(item, dict)
+        }
+
+        session_id = self.session_id
+        results = {}
+        denied = 0
+        for key, call in calls.items():
+            if (json_item := responses.get(requests[key]["id"])) is None:
+                self.metrics.record(call[1], call[2], latency, len(request_data[key]), error=True)
+                results[key] = None
+                continue
+            try:
+                results[key] = self._select(call[1], call[2], self._parse_response(call[0], json_item))
+            except ConnectionError as err:
+                _LOGGER.debug("%s: %s.%s failed: %s", self.host, call[1], call[2], err)
+                self.metrics.record(call[1], call[2], latency, len(request_data[key]), error=True)
+                results[key] = None
+            except PermissionError:
+                self.metrics.record(call[1], call[2], latency, len(request_data[key]), error=True)
+                results[key] = None
+                denied += 1
+            else:
+                self.metrics.record(call[1], call[2], latency, len(request_data[key]))
+
+        if denied == len(calls):
+            # the session itself was rejected, log in again
+            raise PermissionError("Access denied")
+        if denied:
+            # the ACL of the user lacks some objects, the session is fine
+            _LOGGER.debug("%s: %d calls denied by the ACL", self.host, denied)
+            self.session_id = session_id
+
+        self._touch_session()
+        return results
+
+    async def async_connect(self, force=False):
+        """Connect to OpenWrt ubus API.
+
+        Callers that need a session at the same time wait for a single login, unless
+        `force` is set an existing session is kept.
+        """
+        async with self._login_lock:
+            if self.session_id is not None and not force:
+                return self.session_id
+            return await self._async_login()
+
+    async def _async_login(self):
+        self.rpc_id = 1
+
+        try:
+            login = await self.asnyc_api_call(
+                API_RPC_CALL,
+                API_SUBSYS_SESSION,
+                API_METHOD_LOGIN,
+                {
+                    API_PARAM_USERNAME: self.username,
+                    API_PARAM_PASSWORD: self.password,
+                },
+            )
+        except BaseException:
+            self.session_id = None
+            raise
+
+        if login and API_UBUS_RPC_SESSION in login:
+            self.session_id = login[API_UBUS_RPC_SESSION]
+            self.session_timeout = login.get("timeout", SESSION_DEFAULT_TIMEOUT)
+            self.session_expires = time.time() + login.get("expires", self.session_timeout)
+            self.session_store.async_delay_save(self._session_data, 0)
+            self._schedule_session_renewal()
+        else:
+            self.session_id = None
+
+        return self.session_id
+
+    def _session_data(self):
+        return {
+            "session_id": self.session_id,
+            "timeout": self.session_timeout,
+            "expires": self.session_expires,
+        }
+
+    @callback
+    def _touch_session(self):
+        """Every authenticated call extends the session on the router by its timeout."""
+        if self.session_id in (None, API_DEF_SESSION_ID):
+            return
+        self.session_expires = time.time() + self.session_timeout
+        self.session_store.async_delay_save(self._session_data, SESSION_SAVE_DELAY)
+
+    async def async_load_session(self):
+        """Reuse the session saved by a previous run if it has not expired yet.
+
+        Its renewal is only armed by `async_start_session_renewal`, once setup went through.
+        """
+        if (data := await self.session_store.async_load()) is None:
+            return
+
+        if data.get("session_id") and data.get("expires", 0) - time.time() > SESSION_RENEW_MARGIN:
+            _LOGGER.debug("%s: reusing stored session", self.host)
+            self.session_id = data["session_id"]
+            self.session_timeout = data.get("timeout", SESSION_DEFAULT_TIMEOUT)
+            self.session_expires = data["expires"]
+
+    @callback
+    def async_start_session_renewal(self):
+        if self.session_id is not None and self._unsub_session_renewal is None:
+            self._schedule_session_renewal()
+
+    @callback
+    def _schedule_session_renewal(self):
+        if self._unsub_session_renewal is not None:
+            self._unsub_session_renewal()
+            self._unsub_session_renewal = None
+        if self._closed:
+            # a login that finished after the router was closed
+            return
+        delay = max(self.session_expires - time.time() - SESSION_RENEW_MARGIN, 0)
+        self._unsub_session_renewal = async_call_later(self.hass, delay, self._async_renew_session)
+
+    async def _async_renew_session(self, _now):
+        self._unsub_session_renewal = None
+        if self.session_id is None:
+            return
+
+        if self.session_expires - time.time() > SESSION_RENEW_MARGIN:
+            # kept alive by polling in the meantime
+            self._schedule_session_renewal()
+            return
+
+        _LOGGER.debug("%s: renewing session ahead of expiry", self.host)
+        try:
+            await self.async_connect(force=True)
+        except (ConnectionError, TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.debug("%s: session renewal failed: %r", self.host, err)
+
+    async def async_close(self):
+        self._closed = True
+        if self._unsub_session_renewal is not None:
+            self._unsub_session_renewal()
+            self._unsub_session_renewal = None
+        if self._topology_refresh is not None:
+            self._topology_refresh.cancel()
+        for task in self._in_flight.values():
+            task.cancel()
+        if self.session is not None:
+            await self.session.close()
+        if self._event_session is not None:
+            await self._event_session.close()
+
+    def is_logged_in(self):
+        return self.session_id is not None
+
+    def _set_wireless_devices(self, network_devices):
+        wireless_devices = [device["name"]
+                            for device in network_devices.values() if device["wireless"]]
+        if self.wireless_devices is not None and wireless_devices != self.wireless_devices:
+            _LOGGER.info("%s: wireless devices changed from %s to %s",
+                         self.host, self.wireless_devices, wireless_devices)
+        self.wireless_devices = wireless_devices
+        self.topology_updated = time.monotonic()
+
+    def wireless_status_call(self):
+        return (API_RPC_CALL, API_SUBSYS_NETWORK_WIRELESS, API_METHOD_STATUS)
+
+    @staticmethod
+    def _wireless_signature(wireless_status):
+        return tuple(sorted(
+            (
+                radio,
+                bool(status.get("up")),
+                tuple(sorted(interface.get("ifname") or "" for interface in status.get("interfaces", []))),
+            )
+            for radio, status in wireless_status.items()
+        ))
+
+    @callback
+    def async_check_topology(self, wireless_status):
+        """Refresh the radio list in the background when it changed or got stale.
+
+        `wireless_status` is the cheap network.wireless status reply of the current
+        refresh, the full device map is only fetched again when the radio up flags
+        or interface names in it change, or once the cache is older than its TTL.
+        """
+        reason = None
+        if wireless_status is not None:
+            signature = self._wireless_signature(wireless_status)
+            if self.topology_signature is not None and signature != self.topology_signature:
+                reason = "wireless status changed"
+            self.topology_signature = signature
+
+        if reason is None and time.monotonic() - self.topology_updated > self.topology_ttl:
+            reason = "cache expired"
+
+        if reason is None or (self._topology_refresh is not None and not self._topology_refresh.done()):
+            return
+
+        _LOGGER.debug("%s: invalidating network topology, %s", self.host, reason)
+        self._topology_refresh = self.hass.async_create_background_task(
+            self.async_refresh_topology(), f"{DOMAIN} {self.host} topology refresh"
+        )
+
+    async def async_refresh_topology(self):
+        try:
+            result = await self.asnyc_api_call(API_RPC_CALL, API_SUBSYS_LUCI_RPC, API_METHOD_GET_NETWORK_DEVICES)
+        except (ConnectionError, TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.debug("%s: topology refresh failed: %r", self.host, err)
+            return
+        if result is not None:
+            self._set_wireless_devices(result)
+
+    def assoclist_call(self, device):
+        return (API_RPC_CALL, API_SUBSYS_IWINFO, API_METHOD_ASSOCLIST, {"device": device})
+
+    def iwinfo_info_call(self, device):
+        return (API_RPC_CALL, API_SUBSYS_IWINFO, API_METHOD_INFO, {"device": device})
+
+    def survey_call(self, device):
+        return (API_RPC_CALL, API_SUBSYS_IWINFO, API_METHOD_SURVEY, {"device": device})
+
+    @staticmethod
+    def parse_devices_count(results):
+        return sum(len(result["results"]) for result in results if result)
+
+    @staticmethod
+    def parse_assoclist(result):
+        if not result:
+            return None
+        return {client["mac"].lower() for client in result["results"]}
+
+    async def async_get_devices_count(self):
+        if self.wireless_devices is None:
+            if (result := await self.asnyc_api_call(API_RPC_CALL, API_SUBSYS_LUCI_RPC, API_METHOD_GET_NETWORK_DEVICES)) is None:
+                return None
+            self._set_wireless_devices(result)
+
+        results = await self.async_api_batch(
+            {device: self.assoclist_call(device) for device in self.wireless_devices}
+        )
+
+        return self.parse_devices_count(results.values())
+
+    async def async_reboot(self):
+        await self.asnyc_api_call(API_RPC_CALL, API_SUBSYS_SYSTEM, API_METHOD_REBOOT)
+        self._cache.clear()
+
+    def bandwidth_call(self, device):
+        return (API_RPC_CALL, API_SUBSYS_LUCI, API_METHOD_GET_REALTIME_STATS, {"mode": "interface", "device": device})
+
+    async def async_get_bandwidth(self, device):
+        return await self.asnyc_api_call(*self.bandwidth_call(device))
+
+    def system_info_call(self):
+        return (API_RPC_CALL, API_SUBSYS_SYSTEM, API_METHOD_INFO)
+
+    def file_read_call(self, path):
+        return (API_RPC_CALL, API_SUBSYS_FILE, API_METHOD_READ, {API_PARAM_PATH: path})
+
+    def dhcp_leases_call(self):
+        return (API_RPC_CALL, API_SUBSYS_LUCI_RPC, API_METHOD_GET_DHCP_LEASES)
+
+    def device_status_call(self):
+        return (API_RPC_CALL, API_SUBSYS_NETWORK_DEVICE, API_METHOD_STATUS)
+
+    def _set_device_info(self, board_info):
+        self.board_info = board_info
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, self.unique_id)},
+            name=self.name,
+            configuration_url=f"{'https' if self.ssl else 'http'}://{self.host}",
+            model=board_info["model"],
+            sw_version=f"{board_info['release']['description']}(kernel:{board_info['kernel']})"
+        )
+
+    async def async_get_device_info(self):
+        if self.device_info is None:
+            board_info = await self.asnyc_api_call(API_RPC_CALL, API_SUBSYS_SYSTEM, API_METHOD_BOARD)
+            self._set_device_info(board_info)
+
+        return self.device_info
+
+    def metadata(self):
+        """Return what was discovered about the router, for the next start."""
+        return {
+            "board": self.board_info,
+            "wireless_devices": self.wireless_devices,
+            # a missing plugin is not kept, it may be installed before the next start
+            "snapshot_supported": self.snapshot_supported or None,
+        }
+
+    def restore_metadata(self, metadata):
+        if metadata.get("board"):
+            self._set_device_info(metadata["board"])
+        # topology_updated stays 0, so the first refresh checks the radio list again
+        self.wireless_devices = metadata.get("wireless_devices")
+        self.snapshot_supported = metadata.get("snapshot_supported")
+
+    def snapshot_call(self):
+        return (API_RPC_CALL, API_SUBSYS_HA_OPENWRT, API_METHOD_SNAPSHOT)
+
+    def apply_snapshot(self, snapshot):
+        """Take board info and the radio list from a plugin snapshot.
+
+        Returns the interface counters in the shape of a network.device status reply.
+        """
+        self._snapshot_failures = 0
+        if self.device_info is None and snapshot.get("board"):
+            self._set_device_info(snapshot["board"])
+
+        devices = snapshot.get("devices", {})
+        wireless_devices = [name for name, device in devices.items() if device.get("wireless")]
+        if wireless_devices != self.wireless_devices:
+            self._set_wireless_devices(
+                {name: {"name": name, "wireless": device.get("wireless", False)} for name, device in devices.items()}
+            )
+
+        return {
+            name: {"statistics": {"rx_bytes": device["rx_bytes"], "tx_bytes": device["tx_bytes"]}}
+            for name, device in devices.items()
+        }
+
+    def snapshot_failed(self):
+        """Fall back to single calls after a snapshot failed.
+
+        One failure can be a transient error, so the plugin list is checked again on
+        the next refresh. After SNAPSHOT_MAX_FAILURES in a row the plugin is taken as
+        missing until the next PLUGIN_RECHECK_INTERVAL check.
+        """
+        self._snapshot_failures += 1
+        if self._snapshot_failures < SNAPSHOT_MAX_FAILURES:
+            self.snapshot_supported = None
+        else:
+            self._snapshot_failures = 0
+            self.snapshot_supported = False
+            self._snapshot_checked = time.monotonic()
+
+    async def async_discover(self, wireless=True):
+        """Fetch board info and the radio list together if either is still missing.
+
+        Whether the rpcd plugin is installed is checked in the same batch, and again
+        every PLUGIN_RECHECK_INTERVAL while it is not.
+        """
+        calls = {}
+        if self.snapshot_supported is None or (
+            self.snapshot_supported is False
+            and time.monotonic() - self._snapshot_checked >= PLUGIN_RECHECK_INTERVAL
+        ):
+            calls[API_RPC_LIST] = (API_RPC_LIST, API_SUBSYS_HA_OPENWRT, None)
+        if self.device_info is None:
+            calls[API_METHOD_BOARD] = (API_RPC_CALL, API_SUBSYS_SYSTEM, API_METHOD_BOARD)
+        if wireless and self.wireless_devices is None:
+            calls[API_METHOD_GET_NETWORK_DEVICES] = (
+                API_RPC_CALL, API_SUBSYS_LUCI_RPC, API_METHOD_GET_NETWORK_DEVICES)
+        if not calls:
+            return
+
+        results = await self.async_api_batch(calls)
+
+        if API_RPC_LIST in results:
+            objects = results[API_RPC_LIST]
+            self.snapshot_supported = isinstance(objects, dict) and API_SUBSYS_HA_OPENWRT in objects
+            self._snapshot_checked = time.monotonic()
+            _LOGGER.debug("%s: rpcd plugin %s", self.host, "found" if self.snapshot_supported else "not installed")
+        if (board_info := results.get(API_METHOD_BOARD)) is not None:
+            self._set_device_info(board_info)
+        if (network_devices := results.get(API_METHOD_GET_NETWORK_DEVICES)) is not None:
+            self._set_wireless_devices(network_devices)
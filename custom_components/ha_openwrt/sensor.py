@@ -10,27 +10,107 @@ from homeassistant.components.sensor import (
     SensorStateClass
 )
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator
 
 from homeassistant.const import (
     CONF_SENSORS,
-    UnitOfDataRate
+    PERCENTAGE,
+    SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+    EntityCategory,
+    UnitOfDataRate,
+    UnitOfInformation,
+    UnitOfTime
 )
 
 from .const import (
     CONF_BANDWIDTH_DEVICES,
     CONF_SENSOR_BANDWIDTH,
+    CONF_SENSOR_BANDWIDTH_STATISTICS,
+    CONF_SENSOR_CLIENTS,
     CONF_SENSOR_DEVICES_COUNT,
+    CONF_SENSOR_SYSTEM,
+    CONF_SENSOR_TRAFFIC_HISTORY,
+    CONF_SENSOR_WIRELESS,
     DATA_BANDWIDTH,
+    DATA_BANDWIDTH_STATISTICS,
+    DATA_BANDWIDTH_TOTAL,
+    DATA_SYSTEM,
+    DATA_WIRELESS,
     DOMAIN,
-    DATA_DEVICES_COUNT
+    DATA_DEVICES_COUNT,
+    DOWNLOAD,
+    SIGNAL_CLIENT_NEW,
+    SIGNAL_CLIENT_THROUGHPUT_UPDATE,
+    UPLOAD
 )
+from .bandwidth import (
+    STATISTIC_AVERAGE_15M,
+    STATISTIC_AVERAGE_1M,
+    STATISTIC_AVERAGE_5M,
+    STATISTIC_EWMA,
+    STATISTIC_PEAK
+)
+from .system import (
+    SYSTEM_CONNTRACK,
+    SYSTEM_CPU_USAGE,
+    SYSTEM_LAST_BOOT,
+    SYSTEM_LOAD_1,
+    SYSTEM_LOAD_15,
+    SYSTEM_LOAD_5,
+    SYSTEM_MEMORY_FREE
+)
+from .wireless import (
+    WIRELESS_BITRATE,
+    WIRELESS_BUSY,
+    WIRELESS_CHANNEL,
+    WIRELESS_NOISE,
+    WIRELESS_TXPOWER
+)
+
+# key: (name, unit, value of the router's UbusMetrics)
+METRIC_SENSORS = {
+    "ubus_calls": ("Ubus Calls", None, lambda metrics: metrics.calls),
+    "ubus_errors": ("Ubus Errors", None, lambda metrics: metrics.errors),
+    "ubus_timeouts": ("Ubus Timeouts", None, lambda metrics: metrics.timeouts),
+    "ubus_auth_retries": ("Ubus Auth Retries", None, lambda metrics: metrics.auth_retries),
+    "ubus_slowest_latency": (
+        "Ubus Slowest Method Latency",
+        UnitOfTime.MILLISECONDS,
+        lambda metrics: None if (slowest := metrics.slowest) is None else round(slowest[1] * 1000, 1),
+    ),
+}
+
+# key: (name, device class, unit, icon)
+SYSTEM_SENSORS = {
+    SYSTEM_LOAD_1: ("Load (1m)", None, None, "mdi:cpu-64-bit"),
+    SYSTEM_LOAD_5: ("Load (5m)", None, None, "mdi:cpu-64-bit"),
+    SYSTEM_LOAD_15: ("Load (15m)", None, None, "mdi:cpu-64-bit"),
+    SYSTEM_CPU_USAGE: ("CPU Usage", None, PERCENTAGE, "mdi:cpu-64-bit"),
+    SYSTEM_MEMORY_FREE: ("Memory Free", SensorDeviceClass.DATA_SIZE, UnitOfInformation.BYTES, "mdi:memory"),
+    SYSTEM_CONNTRACK: ("Connections", None, None, "mdi:lan-connect"),
+    SYSTEM_LAST_BOOT: ("Last Boot", SensorDeviceClass.TIMESTAMP, None, None),
+}
 
-DOWNLOAD = "download"
-UPLOAD = "upload"
+# key: (name, device class, unit, icon)
+WIRELESS_SENSORS = {
+    WIRELESS_CHANNEL: ("Channel", None, None, "mdi:wifi-settings"),
+    WIRELESS_NOISE: ("Noise", SensorDeviceClass.SIGNAL_STRENGTH, SIGNAL_STRENGTH_DECIBELS_MILLIWATT, None),
+    WIRELESS_TXPOWER: ("TX Power", None, SIGNAL_STRENGTH_DECIBELS_MILLIWATT, "mdi:antenna"),
+    WIRELESS_BUSY: ("Channel Utilization", None, PERCENTAGE, "mdi:chart-donut"),
+    WIRELESS_BITRATE: ("Bitrate", SensorDeviceClass.DATA_RATE, UnitOfDataRate.KILOBITS_PER_SECOND, None),
+}
+
+STATISTIC_NAMES = {
+    STATISTIC_EWMA: "Smoothed",
+    STATISTIC_AVERAGE_1M: "1min Average",
+    STATISTIC_AVERAGE_5M: "5min Average",
+    STATISTIC_AVERAGE_15M: "15min Average",
+    STATISTIC_PEAK: "15min Peak",
+}
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -41,7 +121,7 @@ async def async_setup_entry(
 ) -> None:
     coordinator = hass.data[DOMAIN][entry.entry_id]
 
-    entities = []
+    entities = [UbusMetricSensor(coordinator, key) for key in METRIC_SENSORS]
 
     if CONF_SENSOR_DEVICES_COUNT in entry.data[CONF_SENSORS]:
         entities.append(DevicesCountSensor(coordinator))
@@ -51,14 +131,103 @@ async def async_setup_entry(
         for device in devices:
             for direction in [UPLOAD, DOWNLOAD]:
                 entities.append(BandwidthSensor(coordinator, device, direction))
+
+    if CONF_SENSOR_TRAFFIC_HISTORY in entry.data[CONF_SENSORS]:
+        devices = [device.strip() for device in entry.data.get(CONF_BANDWIDTH_DEVICES, "").split(",") if device]
+        for device in devices:
+            for direction in [UPLOAD, DOWNLOAD]:
+                entities.append(BandwidthTotalSensor(coordinator, device, direction))
+
+    if CONF_SENSOR_SYSTEM in entry.data[CONF_SENSORS]:
+        entities.extend(SystemSensor(coordinator, key) for key in SYSTEM_SENSORS)
+
+    if CONF_SENSOR_WIRELESS in entry.data[CONF_SENSORS]:
+        # radios known from the first refresh or the previous run, a changed radio list needs a reload
+        for device in coordinator.router.wireless_devices or []:
+            entities.extend(RadioSensor(coordinator, device, key) for key in WIRELESS_SENSORS)
+
+    if CONF_SENSOR_BANDWIDTH_STATISTICS in entry.data[CONF_SENSORS]:
+        devices = [device.strip() for device in entry.data.get(CONF_BANDWIDTH_DEVICES, "").split(",") if device]
+        for device in devices:
+            for direction in [UPLOAD, DOWNLOAD]:
+                for statistic in STATISTIC_NAMES:
+                    entities.append(BandwidthStatisticSensor(coordinator, device, direction, statistic))
     
     if entities:
         async_add_entities(entities)
 
+    if CONF_SENSOR_CLIENTS in entry.data[CONF_SENSORS]:
+        registry = coordinator.client_registry
+        # a forgotten client that connects again is announced as new by the registry
+        added = set()
 
-class DevicesCountSensor(CoordinatorEntity, SensorEntity):
+        @callback
+        def async_add_clients(macs):
+            new = [mac for mac in macs if mac not in added]
+            added.update(new)
+            async_add_entities([
+                ClientThroughputSensor(coordinator, registry, mac, direction)
+                for mac in new
+                for direction in [UPLOAD, DOWNLOAD]
+            ])
+
+        async_add_clients(list(registry.clients))
+        entry.async_on_unload(
+            async_dispatcher_connect(hass, SIGNAL_CLIENT_NEW.format(entry.entry_id), async_add_clients)
+        )
+
+
+class OpenwrtSensor(CoordinatorEntity, SensorEntity):
+    """Sensor that reads its value once per refresh and only writes a changed state.
+
+    A refresh changing nothing but other entities' values leaves the state of
+    this one, and the recorder, alone. Changes of a numeric value smaller than
+    `deadband` are not written either.
+    """
 
     _attr_has_entity_name = True
+    deadband = 0
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+        self._written = None
+
+    def _value(self):
+        """Return the value of the latest refresh, only called while available."""
+        raise NotImplementedError
+
+    def _changed(self, state) -> bool:
+        if self._written is None:
+            return True
+        (available, value), (written_available, written_value) = state, self._written
+        if available != written_available:
+            return True
+        if self.deadband and isinstance(value, (int, float)) and isinstance(written_value, (int, float)):
+            return abs(value - written_value) >= self.deadband
+        return value != written_value
+
+    def _update_value(self) -> bool:
+        """Take the value of the latest refresh, return whether the state changed."""
+        available = self.available
+        state = (available, self._value() if available else None)
+        if not self._changed(state):
+            return False
+        self._written = state
+        self._attr_native_value = state[1]
+        return True
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._update_value()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if self._update_value():
+            self.async_write_ha_state()
+
+
+class DevicesCountSensor(OpenwrtSensor):
+
     _attr_icon = "mdi:cellphone-wireless"
     _attr_name = "Clients"
 
@@ -81,14 +250,11 @@ class DevicesCountSensor(CoordinatorEntity, SensorEntity):
             and self.coordinator.data.get(DATA_DEVICES_COUNT) is not None
         )
 
-    @property
-    def native_value(self):
-        """Return the state of the resources."""
+    def _value(self):
         return self.coordinator.data[DATA_DEVICES_COUNT]
 
-class BandwidthSensor(CoordinatorEntity, SensorEntity):
+class BandwidthSensor(OpenwrtSensor):
 
-    _attr_has_entity_name = True
     _attr_device_class = SensorDeviceClass.DATA_RATE
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = UnitOfDataRate.BYTES_PER_SECOND
@@ -102,6 +268,7 @@ class BandwidthSensor(CoordinatorEntity, SensorEntity):
         self.direction = direction
         self._attr_name = f"{device.upper()} {'Upload' if direction == UPLOAD else 'Downoad'} BandWidth"
         self._attr_icon = "mdi:upload" if direction == UPLOAD else "mdi:download"
+        self.deadband = coordinator.bandwidth_deadband
     
     @property
     def device_info(self):
@@ -116,12 +283,204 @@ class BandwidthSensor(CoordinatorEntity, SensorEntity):
             and self.coordinator.data[DATA_BANDWIDTH].get(self.device) is not None
         )
 
+    def _value(self):
+        return self.coordinator.data[DATA_BANDWIDTH][self.device][self.direction]
+
+
+class BandwidthStatisticSensor(BandwidthSensor):
+
+    def __init__(self, coordinator, device: str, direction: str, statistic: str):
+        super().__init__(coordinator, device, direction)
+        self._attr_unique_id = f"{self._attr_unique_id}-{statistic}"
+        self._attr_name = f"{self._attr_name} {STATISTIC_NAMES[statistic]}"
+        self.statistic = statistic
+
+    @property
+    def available(self) -> bool:
+        return (
+            self.coordinator.last_update_success
+            and self.coordinator.data.get(DATA_BANDWIDTH_STATISTICS) is not None
+            and self.coordinator.data[DATA_BANDWIDTH_STATISTICS].get(self.device) is not None
+        )
+
+    def _value(self):
+        return self.coordinator.data[DATA_BANDWIDTH_STATISTICS][self.device][self.direction][self.statistic]
+
+
+class BandwidthTotalSensor(OpenwrtSensor):
+
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_suggested_unit_of_measurement = UnitOfInformation.GIBIBYTES
+
+    def __init__(self, coordinator, device: str, direction: str):
+        super().__init__(coordinator)
+        self._attr_unique_id = f"ha-openwrt-{coordinator.config_entry.entry_id}-{device}-{direction}-total"
+        self._attr_name = f"{device.upper()} Total {'Upload' if direction == UPLOAD else 'Download'}"
+        self._attr_icon = "mdi:upload" if direction == UPLOAD else "mdi:download"
+        self.device = device
+        self.direction = direction
+
+    @property
+    def device_info(self):
+        """Return the device info."""
+        return self.coordinator.router.device_info
+
+    @property
+    def available(self) -> bool:
+        return (
+            super().available
+            and self.coordinator.data.get(DATA_BANDWIDTH_TOTAL) is not None
+            and self.coordinator.data[DATA_BANDWIDTH_TOTAL].get(self.device) is not None
+        )
+
+    def _value(self):
+        return self.coordinator.data[DATA_BANDWIDTH_TOTAL][self.device][self.direction]
+
+
+class ClientThroughputSensor(SensorEntity):
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_device_class = SensorDeviceClass.DATA_RATE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfDataRate.BYTES_PER_SECOND
+    _attr_suggested_unit_of_measurement = UnitOfDataRate.KILOBYTES_PER_SECOND
+
+    def __init__(self, coordinator, registry, mac: str, direction: str):
+        self._coordinator = coordinator
+        self._registry = registry
+        self.mac = mac
+        self.direction = direction
+        self._attr_unique_id = f"ha-openwrt-{registry.entry_id}-client-{mac}-{direction}"
+        self._attr_name = f"{mac} {'Upload' if direction == UPLOAD else 'Download'}"
+        self._attr_icon = "mdi:upload" if direction == UPLOAD else "mdi:download"
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_CLIENT_THROUGHPUT_UPDATE.format(self._registry.entry_id, self.mac, self.direction),
+                self.async_write_ha_state,
+            )
+        )
+
+    @property
+    def device_info(self):
+        """Return the device info."""
+        return self._coordinator.router.device_info
+
+    @property
+    def available(self) -> bool:
+        client = self._registry.clients.get(self.mac)
+        return client is not None and client.connected
+
     @property
     def native_value(self):
         """Return the state of the resources."""
-        history = self.coordinator.data[DATA_BANDWIDTH][self.device]["result"]
-        if len(history) < 2:
+        return getattr(self._registry.clients[self.mac], self.direction)
+
+
+class SystemSensor(OpenwrtSensor):
+
+    def __init__(self, coordinator, key: str):
+        super().__init__(coordinator)
+        self._attr_unique_id = f"ha-openwrt-{coordinator.config_entry.entry_id}-system-{key}"
+        (
+            self._attr_name,
+            self._attr_device_class,
+            self._attr_native_unit_of_measurement,
+            self._attr_icon,
+        ) = SYSTEM_SENSORS[key]
+        if self._attr_device_class == SensorDeviceClass.DATA_SIZE:
+            self._attr_suggested_unit_of_measurement = UnitOfInformation.MEBIBYTES
+        if self._attr_device_class != SensorDeviceClass.TIMESTAMP:
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+        self.key = key
+
+    @property
+    def device_info(self):
+        """Return the device info."""
+        return self.coordinator.router.device_info
+
+    @property
+    def available(self) -> bool:
+        return (
+            super().available
+            and self.coordinator.data.get(DATA_SYSTEM) is not None
+            and self.coordinator.data[DATA_SYSTEM].get(self.key) is not None
+        )
+
+    def _value(self):
+        return self.coordinator.data[DATA_SYSTEM][self.key]
+
+
+class RadioSensor(OpenwrtSensor):
+
+    def __init__(self, coordinator, device: str, key: str):
+        super().__init__(coordinator)
+        self._attr_unique_id = f"ha-openwrt-{coordinator.config_entry.entry_id}-{device}-{key}"
+        name, self._attr_device_class, self._attr_native_unit_of_measurement, self._attr_icon = WIRELESS_SENSORS[key]
+        self._attr_name = f"{device} {name}"
+        if self._attr_device_class == SensorDeviceClass.DATA_RATE:
+            self._attr_suggested_unit_of_measurement = UnitOfDataRate.MEGABITS_PER_SECOND
+        if key != WIRELESS_CHANNEL:
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+        self.device = device
+        self.key = key
+
+    @property
+    def device_info(self):
+        """Return the device info."""
+        return self.coordinator.router.device_info
+
+    @property
+    def available(self) -> bool:
+        return (
+            super().available
+            and self.coordinator.data.get(DATA_WIRELESS) is not None
+            and self.coordinator.data[DATA_WIRELESS].get(self.device) is not None
+            and self.coordinator.data[DATA_WIRELESS][self.device].get(self.key) is not None
+        )
+
+    def _value(self):
+        return self.coordinator.data[DATA_WIRELESS][self.device][self.key]
+
+
+class UbusMetricSensor(CoordinatorEntity, SensorEntity):
+
+    _attr_has_entity_name = True
+    _attr_icon = "mdi:chart-timeline-variant"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator, key: str):
+        super().__init__(coordinator)
+        self._attr_unique_id = f"ha-openwrt-{coordinator.config_entry.entry_id}-{key}"
+        self._attr_name, self._attr_native_unit_of_measurement, self._value = METRIC_SENSORS[key]
+        if self._attr_native_unit_of_measurement is None:
+            self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        else:
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+        self.key = key
+
+    @property
+    def device_info(self):
+        """Return the device info."""
+        return self.coordinator.router.device_info
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @property
+    def native_value(self):
+        """Return the state of the resources."""
+        return self._value(self.coordinator.router.metrics)
+
+    @property
+    def extra_state_attributes(self):
+        if self.key != "ubus_slowest_latency" or (slowest := self.coordinator.router.metrics.slowest) is None:
             return None
-        
-        index = 1 if self.direction == DOWNLOAD else 3
-        return (history[-1][index] - history[-2][index])/(history[-1][0] -  history[-2][0])
\ No newline at end of file
+        return {"method": slowest[0]}
@@ -0,0 +1,94 @@
+"""Resource usage of the router from system info, /proc/stat and the conntrack count."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from homeassistant.util import dt as dt_util
+
+SYSTEM_LOAD_1 = "load_1"
+SYSTEM_LOAD_5 = "load_5"
+SYSTEM_LOAD_15 = "load_15"
+SYSTEM_MEMORY_FREE = "memory_free"
+SYSTEM_LAST_BOOT = "last_boot"
+SYSTEM_CONNTRACK = "conntrack"
+SYSTEM_CPU_USAGE = "cpu_usage"
+
+PROC_STAT = "/proc/stat"
+CONNTRACK_COUNT = "/proc/sys/net/netfilter/nf_conntrack_count"
+
+# system info reports the load average as fixed point with 16 fractional bits
+LOAD_SCALE = 65536
+# boot times computed from uptime wobble by a second or so between polls
+LAST_BOOT_TOLERANCE = timedelta(seconds=60)
+
+
+def first_line(file_reply):
+    """Return the first line of a file read reply."""
+    if not file_reply or not file_reply.get("data"):
+        return None
+    return file_reply["data"].split("\n", 1)[0]
+
+
+class SystemMonitor:
+    """Turn the raw replies of one refresh into sensor values.
+
+    CPU usage is the busy share of the jiffies that passed since the previous
+    update, so the first update has none.
+    """
+
+    def __init__(self) -> None:
+        self._cpu = None
+        self._last_boot = None
+
+    def _cpu_usage(self, cpu_line):
+        # cpu  user nice system idle iowait irq softirq steal guest guest_nice
+        try:
+            jiffies = [int(value) for value in cpu_line.split()[1:9]]
+        except (AttributeError, ValueError):
+            return None
+        if len(jiffies) < 5:
+            return None
+
+        total = sum(jiffies)
+        idle = jiffies[3] + jiffies[4]
+        previous, self._cpu = self._cpu, (total, idle)
+        if previous is None or total <= previous[0]:
+            return None
+        return round(100 * (1 - (idle - previous[1]) / (total - previous[0])), 1)
+
+    def _boot_time(self, uptime):
+        last_boot = dt_util.utcnow().replace(microsecond=0) - timedelta(seconds=uptime)
+        if self._last_boot is None or abs(last_boot - self._last_boot) > LAST_BOOT_TOLERANCE:
+            self._last_boot = last_boot
+        return self._last_boot
+
+    def update(self, info, cpu_line, conntrack) -> dict:
+        values = dict.fromkeys((
+            SYSTEM_LOAD_1, SYSTEM_LOAD_5, SYSTEM_LOAD_15,
+            SYSTEM_MEMORY_FREE, SYSTEM_LAST_BOOT,
+        ))
+
+        if info:
+            load = info.get("load") or []
+            for key, value in zip((SYSTEM_LOAD_1, SYSTEM_LOAD_5, SYSTEM_LOAD_15), load):
+                values[key] = round(value / LOAD_SCALE, 2)
+
+            memory = info.get("memory") or {}
+            if "available" in memory:
+                values[SYSTEM_MEMORY_FREE] = memory["available"]
+            elif "free" in memory:
+                values[SYSTEM_MEMORY_FREE] = (
+                    memory["free"] + memory.get("buffered", 0) + memory.get("cached", 0)
+                )
+
+            if info.get("uptime") is not None:
+                values[SYSTEM_LAST_BOOT] = self._boot_time(info["uptime"])
+
+        values[SYSTEM_CPU_USAGE] = self._cpu_usage(cpu_line)
+
+        try:
+            values[SYSTEM_CONNTRACK] = int(conntrack)
+        except (TypeError, ValueError):
+            values[SYSTEM_CONNTRACK] = None
+
+        return values
@@ -0,0 +1,336 @@
+"""Routers reached through the ubus command line tool instead of JSON-RPC over HTTP."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shlex
+import shutil
+import time
+
+import asyncssh
+
+from .const import (
+    API_DEF_SESSION_ID,
+    API_RPC_CALL,
+    API_RPC_LIST,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_SSH_PORT,
+    DEFAULT_TOPOLOGY_TTL,
+    DEFAULT_UBUS_SOCKET
+)
+from . import codec
+from .breaker import async_tcp_probe
+from .metrics import BATCH
+from .router import UbusRouter
+
+_LOGGER = logging.getLogger(__name__)
+
+UBUS_COMMAND = ("ubus",)
+SHELL = "/bin/sh"
+# exit codes of the shell when ubus is not installed, and of ubus when ubusd cannot be reached
+EXIT_COMMAND_NOT_FOUND = 127
+EXIT_CONNECT_FAILED = 255
+
+SSH_KEEPALIVE_INTERVAL = 30
+SSH_KEEPALIVE_COUNT_MAX = 3
+
+
+def check_local_ubus(socket: str) -> str | None:
+    """Return the error key of what the local transport is missing, does blocking I/O."""
+    if shutil.which(UBUS_COMMAND[0]) is None or not os.access(SHELL, os.X_OK):
+        return "ubus_not_found"
+    if not os.path.exists(socket):
+        return "ubus_socket_not_found"
+    return None
+
+
+class UbusCliRouter(UbusRouter):
+    """Run every batch of ubus calls as one shell script.
+
+    Each call prints `<index> <exit code> <reply>` on a line of its own, the reply
+    being the compact JSON `ubus -S call` writes. There is no login or JSON-RPC
+    envelope, calls run with the rights of the user executing the script.
+    Subclasses provide the shell the script runs in.
+    """
+
+    def __init__(self, hass, unique_id, name, host, topology_ttl=DEFAULT_TOPOLOGY_TTL,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        super().__init__(hass, unique_id, name, host, None, None, False, topology_ttl=topology_ttl,
+                         connect_timeout=connect_timeout, read_timeout=read_timeout)
+        self.ubus_command = UBUS_COMMAND
+        # batches are always a single script
+        self.batch_supported = True
+
+    def _create_session(self):
+        # no HTTP, so no connection pool
+        return None
+
+    def _ubus_args(self) -> list[str]:
+        return [*self.ubus_command, "-S"]
+
+    async def _async_run(self, script: str) -> bytes:
+        """Run a shell script and return its standard output."""
+        raise NotImplementedError
+
+    async def _async_start(self, args: list[str]):
+        """Start a long running command, return a process with a readable `stdout`."""
+        raise NotImplementedError
+
+    async def _async_stop(self, process) -> None:
+        """Stop a process started by `_async_start`."""
+        raise NotImplementedError
+
+    def _script_line(self, index, call) -> str:
+        rpc_method, subsystem, *rest = call
+        if rpc_method == API_RPC_LIST:
+            # `ubus list` prints plain object names, reply with the JSON-RPC shape instead
+            args = [*self._ubus_args(), "list", subsystem]
+            reply = self.json_dumps({subsystem: {}}).decode()
+            return f"{shlex.join(args)} >/dev/null 2>&1; printf '%s %s %s\\n' {index} \"$?\" {shlex.quote(reply)}"
+        if rpc_method != API_RPC_CALL:
+            raise ValueError(f"{rpc_method} has no ubus command line equivalent")
+        method, *params = rest
+        args = [*self._ubus_args(), "-t", str(self.read_timeout), "call", subsystem, method,
+                self.json_dumps(params[0] if params and params[0] else {}).decode()]
+        return f"r=$({shlex.join(args)} 2>/dev/null); printf '%s %s %s\\n' {index} \"$?\" \"$r\""
+
+    async def async_connect(self, force=False):
+        self.session_id = API_DEF_SESSION_ID
+        return self.session_id
+
+    async def async_load_session(self):
+        pass
+
+    def async_start_session_renewal(self):
+        pass
+
+    async def _async_api_call(self, rpc_method, subsystem=None, method=None, params: dict = None):
+        return (await self._async_api_batch({None: (rpc_method, subsystem, method, params)}))[None]
+
+    async def _async_api_gather(self, calls: dict):
+        return await self._async_api_batch(calls)
+
+    async def _async_api_batch(self, calls: dict):
+        if not calls:
+            return {}
+
+        keys = list(calls)
+        lines = [self._script_line(index, calls[key]) for index, key in enumerate(keys)]
+        script = "\n".join(lines)
+
+        start = time.monotonic()
+        try:
+            async with self.calls_in_flight, self._fleet_slot():
+                output = await self._async_run(script)
+        except TimeoutError:
+            self.metrics.record(*BATCH, time.monotonic() - start, len(script), timeout=True)
+            for call in calls.values():
+                self.metrics.record(call[1], call[2], time.monotonic() - start, timeout=True)
+            raise
+        except OSError as err:
+            self.metrics.record(*BATCH, time.monotonic() - start, len(script), error=True)
+            raise ConnectionError(f"{self.ubus_command[0]}: {err}") from err
+        latency = time.monotonic() - start
+        _LOGGER.debug("%s: %d ubus calls took %.3fs", self.host, len(calls), latency)
+
+        replies = {}
+        for line in output.splitlines():
+            index, code, reply = (line.split(b" ", 2) + [b""])[:3]
+            try:
+                replies[int(index)] = (int(code), reply)
+            except ValueError:
+                _LOGGER.debug("%s: unexpected output %r", self.host, line)
+
+        codes = {code for code, _ in replies.values()}
+        # not a failure of single calls, the breaker has to see these
+        if not replies or codes & {EXIT_COMMAND_NOT_FOUND, EXIT_CONNECT_FAILED}:
+            self.metrics.record(*BATCH, latency, len(script), len(output), error=True)
+            if EXIT_COMMAND_NOT_FOUND in codes:
+                raise ConnectionError(f"{self.host}: {self.ubus_command[0]} not found")
+            if EXIT_CONNECT_FAILED in codes:
+                raise ConnectionError(f"{self.host}: {self.ubus_command[0]} failed to connect to ubusd")
+            raise ConnectionError(f"{self.host}: no output from {self.ubus_command[0]}")
+        self.metrics.record(*BATCH, latency, len(script), len(output))
+
+        results = {}
+        for index, key in enumerate(keys):
+            call = calls[key]
+            code, reply = replies.get(index, (None, b""))
+            if code != 0:
+                _LOGGER.debug("%s: %s.%s failed with status %s", self.host, call[1], call[2], code)
+                self.metrics.record(call[1], call[2], latency, len(lines[index]), error=True)
+                results[key] = None
+                continue
+            self.metrics.record(call[1], call[2], latency, len(lines[index]), len(reply))
+            # calls without a reply, like reboot, print nothing
+            result = await codec.async_loads(self.hass, reply, self.json_loads) if reply else None
+            results[key] = self._select(call[1], call[2], result)
+
+        return results
+
+    async def async_subscribe(self, path):
+        await self._async_check_breaker()
+        process = await self._async_start([*self._ubus_args(), "subscribe", path])
+        try:
+            yield None, None
+            async for line in process.stdout:
+                try:
+                    message = self.json_loads(line)
+                except ValueError:
+                    continue
+                for event, data in message.items():
+                    yield event, data
+        finally:
+            await self._async_stop(process)
+        raise ConnectionError(f"ubus subscribe {path} exited with status {process.returncode}")
+
+
+class LocalUbusRouter(UbusCliRouter):
+    """ubus on the machine Home Assistant runs on, through its unix socket."""
+
+    def __init__(self, hass, unique_id, name, host, socket=DEFAULT_UBUS_SOCKET,
+                 topology_ttl=DEFAULT_TOPOLOGY_TTL, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT):
+        super().__init__(hass, unique_id, name, host, topology_ttl, connect_timeout, read_timeout)
+        self.socket = socket
+
+    def _ubus_args(self) -> list[str]:
+        return [*super()._ubus_args(), "-s", self.socket]
+
+    async def _async_probe(self) -> bool:
+        try:
+            async with asyncio.timeout(self.connect_timeout):
+                _, writer = await asyncio.open_unix_connection(self.socket)
+        except (OSError, TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    async def _async_run(self, script: str) -> bytes:
+        process = await asyncio.create_subprocess_exec(
+            SHELL, "-c", script,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            async with asyncio.timeout(self.timeout):
+                output, _ = await process.communicate()
+        except TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        return output
+
+    async def _async_start(self, args: list[str]):
+        return await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+
+    async def _async_stop(self, process) -> None:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+
+class SshUbusRouter(UbusCliRouter):
+    """ubus over one persistent SSH connection, every batch runs in a channel of its own.
+
+    The connection is kept alive with SSH keepalives. When it drops or cannot be
+    opened, the circuit breaker of the router backs off connecting again. The host
+    key is trusted on first use, later connections must present the same key.
+    """
+
+    def __init__(self, hass, unique_id, name, host, username, password, port=DEFAULT_SSH_PORT,
+                 topology_ttl=DEFAULT_TOPOLOGY_TTL, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, host_key=None):
+        super().__init__(hass, unique_id, name, host, topology_ttl, connect_timeout, read_timeout)
+        self.username = username
+        self.password = password
+        self.port = port
+        # OpenSSH public key of the router, pinned on the first connection
+        self.host_key = host_key
+        # called with the key when it is pinned
+        self.host_key_callback = None
+        self._connection = None
+        self._connection_lock = asyncio.Lock()
+
+    async def _async_connection(self):
+        async with self._connection_lock:
+            if self._connection is not None:
+                return self._connection
+
+            if self.host_key is None:
+                # trust on first use, the key presented now is the only one accepted later
+                known_hosts = None
+            else:
+                known_hosts = ([asyncssh.import_public_key(self.host_key)], [], [])
+
+            try:
+                self._connection = await asyncssh.connect(
+                    self.host,
+                    port=self.port,
+                    username=self.username,
+                    password=self.password or None,
+                    known_hosts=known_hosts,
+                    connect_timeout=self.connect_timeout,
+                    keepalive_interval=SSH_KEEPALIVE_INTERVAL,
+                    keepalive_count_max=SSH_KEEPALIVE_COUNT_MAX,
+                )
+            except asyncssh.HostKeyNotVerifiable as err:
+                raise ConnectionError(
+                    f"{self.host}: ssh host key differs from the one pinned on the first connection, "
+                    "if the router was reinstalled trust its new key in the options"
+                ) from err
+            except (OSError, asyncssh.Error) as err:
+                raise ConnectionError(f"{self.host}: ssh connection failed: {err}") from err
+
+            if self.host_key is None:
+                key = self._connection.get_server_host_key()
+                self.host_key = key.export_public_key().decode().strip()
+                _LOGGER.info("%s: pinned ssh host key %s", self.host, key.get_fingerprint())
+                if self.host_key_callback is not None:
+                    self.host_key_callback(self.host_key)
+
+            _LOGGER.debug("%s: ssh connection open", self.host)
+            return self._connection
+
+    async def _async_probe(self) -> bool:
+        if self._connection is not None:
+            return True
+        return await async_tcp_probe(self.host, self.port, self.connect_timeout)
+
+    def _drop_connection(self, connection) -> None:
+        if self._connection is connection:
+            self._connection = None
+        connection.close()
+
+    async def _async_run(self, script: str) -> bytes:
+        connection = await self._async_connection()
+        try:
+            async with asyncio.timeout(self.timeout):
+                result = await connection.run(script, check=False, encoding=None)
+        except (OSError, asyncssh.Error) as err:
+            self._drop_connection(connection)
+            raise ConnectionError(f"{self.host}: ssh command failed: {err}") from err
+        return result.stdout or b""
+
+    async def _async_start(self, args: list[str]):
+        connection = await self._async_connection()
+        try:
+            return await connection.create_process(shlex.join(args), encoding=None)
+        except (OSError, asyncssh.Error) as err:
+            self._drop_connection(connection)
+            raise ConnectionError(f"{self.host}: ssh command failed: {err}") from err
+
+    async def _async_stop(self, process) -> None:
+        process.close()
+        await process.wait_closed()
+
+    async def async_close(self):
+        await super().async_close()
+        if self._connection is not None:
+            self._drop_connection(self._connection)
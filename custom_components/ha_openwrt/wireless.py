@@ -0,0 +1,70 @@
+"""Per radio channel, noise, power, utilization and bitrate from iwinfo info and survey."""
+from __future__ import annotations
+
+WIRELESS_CHANNEL = "channel"
+WIRELESS_NOISE = "noise"
+WIRELESS_TXPOWER = "txpower"
+WIRELESS_BUSY = "busy"
+WIRELESS_BITRATE = "bitrate"
+
+
+def survey_entry(survey, frequency):
+    """Return the survey of the channel the radio is on."""
+    if not survey or frequency is None:
+        return None
+    for entry in survey.get("results", []):
+        if entry.get("mhz") == frequency:
+            return entry
+    return None
+
+
+class RadioMonitor:
+    """Turn the iwinfo replies of one refresh into sensor values.
+
+    The busy and active times of a survey count up since the driver started
+    measuring, busy percentage is the share of the active time that passed since
+    the previous update. It starts over when the radio changes channel.
+    """
+
+    def __init__(self) -> None:
+        self._times = {}
+
+    def _busy(self, device, frequency, entry):
+        try:
+            times = (frequency, int(entry["active_time"]), int(entry["busy_time"]))
+        except (KeyError, TypeError, ValueError):
+            self._times.pop(device, None)
+            return None
+
+        previous, self._times[device] = self._times.get(device), times
+        if previous is None or previous[0] != frequency:
+            return None
+        active = times[1] - previous[1]
+        busy = times[2] - previous[2]
+        if active <= 0 or busy < 0:
+            return None
+        return round(min(100 * busy / active, 100), 1)
+
+    def update(self, device, info, survey) -> dict:
+        values = dict.fromkeys((
+            WIRELESS_CHANNEL, WIRELESS_NOISE, WIRELESS_TXPOWER, WIRELESS_BUSY, WIRELESS_BITRATE,
+        ))
+        if not info:
+            self._times.pop(device, None)
+            return values
+
+        values[WIRELESS_CHANNEL] = info.get("channel")
+        values[WIRELESS_TXPOWER] = info.get("txpower")
+        values[WIRELESS_BITRATE] = info.get("bitrate")
+        # drivers without a noise floor report 0
+        values[WIRELESS_NOISE] = info.get("noise") or None
+
+        frequency = info.get("frequency")
+        if (entry := survey_entry(survey, frequency)) is None:
+            self._times.pop(device, None)
+            return values
+
+        if values[WIRELESS_NOISE] is None:
+            values[WIRELESS_NOISE] = entry.get("noise") or None
+        values[WIRELESS_BUSY] = self._busy(device, frequency, entry)
+        return values
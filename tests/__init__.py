@@ -0,0 +1 @@
+"""Tests of the ha_openwrt integration."""
@@ -0,0 +1,78 @@
+"""Fixtures of the ha_openwrt tests.
+
+Needs pytest-homeassistant-custom-component, see requirements_test.txt.
+"""
+from __future__ import annotations
+
+import socket
+
+import pytest
+from homeassistant import config_entries
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_SCAN_INTERVAL,
+    CONF_SENSORS,
+    CONF_SSL,
+    CONF_USERNAME,
+    CONF_VERIFY_SSL,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.ha_openwrt.const import CONF_SENSOR_CLIENTS, DOMAIN
+from custom_components.ha_openwrt.coordinator import OpenwrtDataUpdateCoordinator
+from custom_components.ha_openwrt.router import UbusRouter
+
+BOARD = {
+    "model": "Fake Router",
+    "kernel": "5.15.0",
+    "release": {"description": "OpenWrt 23.05.0"},
+}
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    yield
+
+
+@pytest.fixture
+def dead_host() -> str:
+    """Return host:port of a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"127.0.0.1:{port}"
+
+
+@pytest.fixture
+async def discovered_router(hass, dead_host):
+    """A router whose discovery was restored from a previous run, so refreshes only poll."""
+    router = UbusRouter(hass, "test", "Test", dead_host, "root", "", False, connect_timeout=1, read_timeout=1)
+    router.restore_metadata({"board": BOARD, "wireless_devices": [], "snapshot_supported": True})
+    yield router
+    await router.async_close()
+
+
+@pytest.fixture
+async def clients_coordinator(hass, dead_host):
+    """A coordinator tracking clients of a router that does not answer."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Test",
+        data={
+            CONF_NAME: "Test",
+            CONF_HOST: dead_host,
+            CONF_USERNAME: "root",
+            CONF_PASSWORD: "",
+            CONF_SSL: False,
+            CONF_VERIFY_SSL: False,
+            CONF_SCAN_INTERVAL: 5,
+            CONF_SENSORS: [CONF_SENSOR_CLIENTS],
+        },
+    )
+    entry.add_to_hass(hass)
+    config_entries.current_entry.set(entry)
+    coordinator = OpenwrtDataUpdateCoordinator(hass, config=entry.data)
+    yield coordinator
+    await coordinator.async_close()
@@ -0,0 +1,32 @@
+"""Circuit breaker of the router client."""
+from __future__ import annotations
+
+import aiohttp
+import pytest
+
+from custom_components.ha_openwrt.breaker import FAILURE_THRESHOLD
+
+
+async def async_refresh(router) -> None:
+    """What the coordinator sends every refresh once discovery is done."""
+    await router.async_discover()
+    await router.async_api_batch({"info": router.system_info_call()})
+
+
+async def test_dead_router_opens_circuit(discovered_router) -> None:
+    for _ in range(FAILURE_THRESHOLD):
+        assert not discovered_router.breaker.is_open
+        with pytest.raises((ConnectionError, TimeoutError, aiohttp.ClientError)):
+            await async_refresh(discovered_router)
+
+    assert discovered_router.breaker.failures == FAILURE_THRESHOLD
+    assert discovered_router.breaker.is_open
+
+
+async def test_nothing_to_send_leaves_breaker_alone(discovered_router) -> None:
+    discovered_router.breaker.failures = FAILURE_THRESHOLD - 1
+
+    await discovered_router.async_discover()
+    assert await discovered_router.async_api_batch({}) == {}
+
+    assert discovered_router.breaker.failures == FAILURE_THRESHOLD - 1
@@ -0,0 +1,15 @@
+"""Source of the DHCP leases."""
+from __future__ import annotations
+
+from custom_components.ha_openwrt.const import DATA_LEASES
+
+LUCI_LEASES = {"dhcp_leases": [{"macaddr": "AA:BB:CC:DD:EE:FF", "hostname": "phone", "ipaddr": "192.168.1.10"}]}
+
+
+async def test_failed_batch_keeps_luci_rpc(clients_coordinator) -> None:
+    assert not await clients_coordinator._async_update_leases({DATA_LEASES: None})
+    assert not clients_coordinator.leases_from_file
+
+    assert await clients_coordinator._async_update_leases({DATA_LEASES: LUCI_LEASES})
+    assert not clients_coordinator.leases_from_file
+    assert clients_coordinator.client_registry.leases.get("aa:bb:cc:dd:ee:ff").hostname == "phone"